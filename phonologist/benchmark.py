@@ -0,0 +1,243 @@
+# -*- encoding: utf-8 -*-
+"""
+Time and memory of every public query method on synthetic Perkins
+style corpora, compared against a saved baseline.
+usage: python benchmark.py [ options ]
+"""
+import inspect
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import timeit
+import types
+from bisect import bisect
+from multiprocessing import Pool
+from optparse import OptionParser
+from constants import ( __version__, IPA_SYMBOLS, VOWELLS, CONSONANTS, STRESS, SYLLABLE,
+						COMMA, PERIOD, NASALS )
+from phonologist import Words, Syllables, Symbols, Features
+
+SIZES = ( 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7 )
+CLASSES = ( Words, Syllables, Symbols, Features )
+# methods that change the corpus or load it
+SKIP = frozenset( [ "append", "extend", "loadfile" ] )
+# arguments of the methods that need them, built from the loaded corpus
+ARGUMENTS = {
+	"count_token": lambda corpus: ( corpus.tokens[ 0 ], ),
+	"preceding_token": lambda corpus: ( corpus.tokens[ 0 ], ),
+	"posterior_token": lambda corpus: ( corpus.tokens[ 0 ], ),
+	"token_by_symbol": lambda corpus: ( u"a", ),
+	"stressed_token_by_symbol": lambda corpus: ( u"a", ),
+	"unstressed_token_by_symbol": lambda corpus: ( u"a", ),
+	"token_by_symbols": lambda corpus: ( [ u"a", u"s" ], ),
+	"pretonic_postonic_words": lambda corpus: ( u"a", ),
+	"constituent_frequency": lambda corpus: ( "nucleus", ),
+	"count_symbol": lambda corpus: ( u"a", ),
+	"preceding_symbol": lambda corpus: ( u"a", ),
+	"preceding_consonant": lambda corpus: ( u"a", ),
+	"preceding_vowell": lambda corpus: ( u"s", ),
+	"posterior_symbol": lambda corpus: ( u"a", ),
+	"posterior_consonant": lambda corpus: ( u"a", ),
+	"posterior_vowell": lambda corpus: ( u"s", ),
+	"features": lambda corpus: ( [ "nasal" ], ),
+	"feature_positions": lambda corpus: ( [ "nasal" ], ),
+	"find_plus": lambda corpus: ( [ "nasal" ], ),
+	"find_minus": lambda corpus: ( [ "son" ], ),
+	"feature_group": lambda corpus: ( NASALS, ),
+	"features_in_common": lambda corpus: ( u"m", u"n" ),
+	"nearest_symbol": lambda corpus: ( u"p", 3 ),
+	"similarity": lambda corpus: ( u"p", u"b" ),
+	"neighbours": lambda corpus: ( corpus.tokens[ 0 ], ),
+	"count_patterns": lambda corpus: ( [ u"[+nasal] . C", u"# %s C" % STRESS, u"V #", u"C C" ], ),
+	"find_pattern": lambda corpus: ( u"[+nasal] . C", ),
+	"compile_patterns": lambda corpus: ( [ u"[+nasal] . C", u"V #" ], ),
+}
+
+
+def generate( n_tokens, seed=0 ):
+	"""
+	Lines of a synthetic transcription in the Perkins format: stressed
+	and unstressed words split into syllables with '.', phrase marks
+	'|' and '‖', word types drawn with Zipfian frequencies.
+	The same seed always gives the same lines.
+	--------------------
+	n_tokens - number of whitespace separated tokens, marks included
+	"""
+	rng = random.Random( seed )
+	consonants = [ symbol for symbol in CONSONANTS if symbol in IPA_SYMBOLS ]
+	vowells = [ symbol for symbol in VOWELLS if symbol in IPA_SYMBOLS ]
+	n_types = min( 100000, max( 50, int( n_tokens ** 0.6 ) ) )
+	lexicon = [ _word( rng, consonants, vowells ) for ndx in xrange( n_types ) ]
+	cumulative = []
+	total = 0.0
+	for rank in xrange( 1, n_types + 1 ):
+		total += 1.0 / rank
+		cumulative.append( total )
+	produced = 0
+	while produced < n_tokens:
+		line = []
+		for ndx in xrange( min( rng.randint( 5, 20 ), n_tokens - produced ) ):
+			if line and rng.random() < 0.08:
+				line.append( COMMA )
+			else:
+				line.append( lexicon[ bisect( cumulative, rng.random() * total ) ] )
+		if len( line ) < n_tokens - produced and rng.random() < 0.5:
+			line.append( PERIOD )
+		produced += len( line )
+		yield u" ".join( line )
+
+def _word( rng, consonants, vowells ):
+	n_syllables = rng.choice( ( 1, 1, 1, 2, 2, 2, 2, 3, 3, 4 ) )
+	stressed = None
+	if n_syllables == 1:
+		if rng.random() < 0.5:
+			stressed = 0
+	else:
+		stressed = n_syllables - rng.choice( ( 1, 2, 2, 2, 2, 3 ) )
+		stressed = max( stressed, 0 )
+	syllables = []
+	for ndx in xrange( n_syllables ):
+		onset = rng.choice( ( 0, 1, 1, 1, 1, 2 ) )
+		coda = rng.choice( ( 0, 0, 0, 1 ) )
+		syllable = [ rng.choice( consonants ) for c in xrange( onset ) ]
+		syllable.append( rng.choice( vowells ) )
+		syllable.extend( [ rng.choice( consonants ) for c in xrange( coda ) ] )
+		if ndx == stressed:
+			syllable.insert( 0, STRESS )
+		syllables.append( u"".join( syllable ) )
+	return SYLLABLE.join( syllables )
+
+def write_corpus( path, n_tokens, seed=0 ):
+	f = io.open( path, "w", encoding="utf-8" )
+	try:
+		for line in generate( n_tokens, seed ):
+			f.write( line + u"\n" )
+	finally:
+		f.close()
+
+def public_methods( cls ):
+	"""
+	Names of the public query methods of cls.
+	"""
+	return [ name for name, method in inspect.getmembers( cls, inspect.ismethod )
+		if not name.startswith( "_" ) and name not in SKIP ]
+
+def measure( ( ipa_textfile, cache, class_name, method, repeat ) ):
+	"""
+	Time one method on a freshly loaded corpus. Run in its own process
+	so the peak memory of the call is not hidden by earlier calls.
+	--------------------
+	return - ( class_name, method, { first, best, memory } ), first the
+	seconds of the first ( cold ) call, best the fastest of repeat calls
+	and memory the growth of the peak resident size in KB
+	"""
+	cls = dict( [ ( c.__name__, c ) for c in CLASSES ] )[ class_name ]
+	corpus = cls.loadfile( ipa_textfile, cache=cache )
+	args = ARGUMENTS.get( method, lambda corpus: () )( corpus )
+	peak = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+	times = []
+	for ndx in xrange( repeat ):
+		start = timeit.default_timer()
+		result = getattr( corpus, method )( *args )
+		if isinstance( result, types.GeneratorType ):
+			for item in result:
+				pass
+		times.append( timeit.default_timer() - start )
+	memory = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss - peak
+	return class_name, method, { "first": times[ 0 ], "best": min( times ), "memory": memory }
+
+def run_benchmarks( sizes=SIZES[ :3 ], seed=0, repeat=3, classes=CLASSES ):
+	"""
+	Benchmark every public method of classes on a corpus of each size.
+	Corpora are compiled once ( see BasePhonologist.loadfile ) so every
+	measurement starts from the same warm load.
+	--------------------
+	return - dict { size : { "Class.method" : { first, best, memory } } }
+	"""
+	directory = tempfile.mkdtemp()
+	results = {}
+	pool = Pool( 1, maxtasksperchild=1 )
+	try:
+		for size in sizes:
+			path = os.path.join( directory, "corpus-%d.txt" % size )
+			write_corpus( path, size, seed )
+			tasks = []
+			for cls in classes:
+				cls.loadfile( path, cache=directory )
+				tasks.extend( [ ( path, directory, cls.__name__, method, repeat )
+					for method in public_methods( cls ) ] )
+			size_results = results[ str( size ) ] = {}
+			for class_name, method, measures in pool.imap( measure, tasks ):
+				size_results[ "%s.%s" % ( class_name, method ) ] = measures
+	finally:
+		pool.close()
+		pool.join()
+		shutil.rmtree( directory )
+	return results
+
+def compare( results, baseline, tolerance=0.5, min_time=0.005, min_memory=1024 ):
+	"""
+	Find the measures that got worse than the baseline by more than
+	tolerance ( 0.5 is 50% ). Differences under min_time seconds or
+	min_memory KB are noise.
+	--------------------
+	return - list [ ( size, name, measure, baseline value, value ), ... ]
+	"""
+	regressions = []
+	for size, size_results in sorted( results.iteritems() ):
+		for name, measures in sorted( size_results.iteritems() ):
+			old = baseline.get( size, {} ).get( name )
+			if old is None:
+				continue
+			for measure, floor in ( ( "best", min_time ), ( "memory", min_memory ) ):
+				if measures[ measure ] > old[ measure ] * ( 1 + tolerance ) + floor:
+					regressions.append( ( size, name, measure, old[ measure ], measures[ measure ] ) )
+	return regressions
+
+def write_baseline( path, results, seed=0 ):
+	data = { "version": __version__, "python": platform.python_version(),
+			"machine": platform.machine(), "seed": seed, "results": results }
+	f = open( path, "w" )
+	try:
+		json.dump( data, f, indent=1, sort_keys=True )
+	finally:
+		f.close()
+
+def read_baseline( path ):
+	f = open( path )
+	try:
+		return json.load( f )[ "results" ]
+	finally:
+		f.close()
+
+
+if __name__ == '__main__':
+	parser = OptionParser( usage=__doc__ )
+	parser.add_option( "-s", "--sizes", default="1000,10000,100000",
+		help="comma separated corpus sizes in tokens" )
+	parser.add_option( "-r", "--repeat", type="int", default=3 )
+	parser.add_option( "--seed", type="int", default=0 )
+	parser.add_option( "-b", "--baseline", help="json baseline to compare against" )
+	parser.add_option( "-o", "--output", help="write the results as a json baseline" )
+	parser.add_option( "-t", "--tolerance", type="float", default=0.5 )
+	options, args = parser.parse_args()
+	sizes = [ int( size ) for size in options.sizes.split( "," ) ]
+	results = run_benchmarks( sizes, options.seed, options.repeat )
+	for size in sizes:
+		for name, measures in sorted( results[ str( size ) ].iteritems() ):
+			print "%9d %-45s %10.4fs %10.4fs %8dKB" % ( size, name, measures[ "first" ],
+				measures[ "best" ], measures[ "memory" ] )
+	if options.output:
+		write_baseline( options.output, results, options.seed )
+	if options.baseline:
+		regressions = compare( results, read_baseline( options.baseline ), options.tolerance )
+		for regression in regressions:
+			print "REGRESSION %s %s %s: %s -> %s" % regression
+		if regressions:
+			sys.exit( 1 )
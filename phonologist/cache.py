@@ -0,0 +1,150 @@
+# -*- encoding: utf-8 -*-
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from constants import __version__
+from corpus import Lexicon, TokenArray, TYPECODE
+
+MAGIC = "PHONOLOGIST-CORPUS\n"
+# bump when the layout of compiled corpora changes
+FORMAT = 4
+SUFFIX = ".phon"
+HASH_BLOCK = 1024 * 1024
+# TokenArray boundries kept in a compiled corpus
+OFFSETS = ( "syllable_offsets", "word_offsets" )
+
+
+def file_key( ipa_textfile, level, encoding, normalizer=None ):
+	"""
+	Hash of the file content, the library version and how the
+	file is read. A compiled corpus is only used if its key matches.
+	normalizer - the fileutils.Normalizer the file is read through
+	"""
+	digest = hashlib.sha1()
+	digest.update( "%s %d %s %s\n" % ( __version__, FORMAT, level, encoding ) )
+	if normalizer is not None:
+		digest.update( normalizer.key().encode( 'utf-8' ) + "\n" )
+	f = open( ipa_textfile, "rb" )
+	try:
+		while True:
+			block = f.read( HASH_BLOCK )
+			if not block:
+				break
+			digest.update( block )
+	finally:
+		f.close()
+	return digest.hexdigest()
+
+def cache_path( ipa_textfile, level, key, cache ):
+	"""
+	cache - True to keep the compiled corpus next to the source file,
+	or the directory to keep it in.
+	"""
+	if cache is True:
+		return "%s.%s%s" % ( ipa_textfile, level, SUFFIX )
+	return os.path.join( cache, key + SUFFIX )
+
+def write_compiled( path, key, tokens, statistics ):
+	"""
+	Write a compiled corpus: a json header line, the vocabulary as
+	utf-8 lines, the raw id and offset arrays and each statistic
+	marshalled apart. Written to a temporary file first so readers
+	never see half a file.
+	--------------------
+	statistics - dict { name : object }, built from dicts, sets,
+	unicode and numbers only
+	"""
+	vocabulary = u"\n".join( tokens.vocabulary.tokens ).encode( 'utf-8' )
+	ids = tokens.ids.tostring()
+	offsets = [ ( name, getattr( tokens, name ) ) for name in OFFSETS ]
+	offsets = [ ( name, None if value is None else array( TYPECODE, value ).tostring() )
+		for name, value in offsets ]
+	names = sorted( statistics )
+	marshalled = [ marshal.dumps( statistics[ name ] ) for name in names ]
+	header = { "format": FORMAT, "key": key, "level": tokens.level,
+			"typecode": TYPECODE, "itemsize": tokens.ids.itemsize,
+			"byteorder": sys.byteorder, "types": len( tokens.vocabulary ),
+			"vocabulary": len( vocabulary ), "ids": len( ids ),
+			"offsets": [ [ name, None if data is None else len( data ) ] for name, data in offsets ],
+			"statistics": [ [ name, len( data ) ] for name, data in zip( names, marshalled ) ] }
+	directory = os.path.dirname( os.path.abspath( path ) )
+	if not os.path.isdir( directory ):
+		os.makedirs( directory )
+	fd, temp_path = tempfile.mkstemp( dir=directory, suffix=SUFFIX )
+	f = os.fdopen( fd, "wb" )
+	try:
+		f.write( MAGIC )
+		f.write( json.dumps( header ) + "\n" )
+		f.write( vocabulary )
+		f.write( ids )
+		for name, data in offsets:
+			if data is not None:
+				f.write( data )
+		for data in marshalled:
+			f.write( data )
+	finally:
+		f.close()
+	os.rename( temp_path, path )
+
+def read_compiled( path, key ):
+	"""
+	Memory map a compiled corpus. The statistics are left marshalled,
+	to be loaded with load_statistic when first needed.
+	--------------------
+	return - ( TokenArray, { name : marshalled statistic } ), or None when
+	the file is missing, stale or was written on an incompatible machine
+	"""
+	if not os.path.exists( path ):
+		return None
+	f = open( path, "rb" )
+	try:
+		if os.fstat( f.fileno() ).st_size == 0:
+			return None
+		buf = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
+	finally:
+		f.close()
+	try:
+		if buf.readline() != MAGIC:
+			return None
+		header = json.loads( buf.readline() )
+		if header[ "format" ] != FORMAT or header[ "key" ] != key or \
+				header[ "typecode" ] != TYPECODE or \
+				header[ "itemsize" ] != array( TYPECODE ).itemsize or \
+				header[ "byteorder" ] != sys.byteorder:
+			return None
+		start = buf.tell()
+		end = start + header[ "vocabulary" ]
+		vocabulary = buf[ start:end ].decode( 'utf-8' )
+		start, end = end, end + header[ "ids" ]
+		ids = array( TYPECODE )
+		ids.fromstring( buf[ start:end ] )
+		offsets = {}
+		for name, size in header[ "offsets" ]:
+			offsets[ name ] = None
+			if size is not None:
+				start, end = end, end + size
+				offsets[ name ] = array( TYPECODE )
+				offsets[ name ].fromstring( buf[ start:end ] )
+		statistics = {}
+		for name, size in header[ "statistics" ]:
+			start, end = end, end + size
+			statistics[ name ] = buf[ start:end ]
+	finally:
+		buf.close()
+	tokens = TokenArray( Lexicon(), header[ "level" ], ids, **offsets )
+	if header[ "types" ]:
+		for token in vocabulary.split( u"\n" ):
+			tokens.vocabulary.intern( token )
+	return tokens, statistics
+
+def load_statistic( data ):
+	"""
+	marshal only rebuilds plain values, a compiled corpus from a
+	shared cache directory can not run code when loaded.
+	"""
+	return marshal.loads( data )
@@ -2,6 +2,7 @@
 
 __author__ = "David Michael Brown"
 __status__ = "Development"
+__version__ = "0.2"
 
 STRESS = u'\u02c8' 
 PERIOD = u'\u2016'
@@ -42,153 +43,5 @@ FEATURE_GROUPS = [CONSONANTS, CORONAL_OBSTRUENTS, PALATAL_OBSTRUENTS, NONCORONAL
                 LARYNGEALS, AFFRICATES, NASALS_LIQUIDS, NASALS, LIQUIDS, VOWELLS_GLIDES, 
                 GLIDES, VOWELLS ]
 
-FMATRIX = {
-"cons": 
-["+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+",
-"+", "+ ", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "-", "-", "-", "+", "+", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-"], 
-"dist":
-["-", "-", "-", "-", "-", "-", "-", "-", "+", "+", "+", "+", "+ ", "+", "0",
-"0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0",
-"0", "0", "0", "+", "+", "-", "-", "0", "-", "0", "-", "0", "0", "-", "0",
-"-", "-", "-", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0",
-"0", "0", "0", "0", "0", "0", "0", "0", "0"], 
-"syll": 
-["-", "-", "-", "-","-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+"], 
-"back": 
-["0", "0", "0", "0", "0", "0", "0", "0",
-"0", "0", "-", "-", "-", "-", "0", "0", "0", "0", "0", "0", "+", "+", "+",
-"+", "+", "+", "+", "+", "0", "0", "0", "0", "0", "-", "-", "0", "0", "0",
-"0", "+", "-", "-", "+", "0", "-", "0", "0", "0", "+", "-", "+", "-", "+",
-"-", "-", "+", "+", "-", "-", "+", "+", "-", "-", "-", "-", "-", "-", "+",
-"+"], 
-"son": 
-["-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+"], 
-"ant": 
-["+", "+", "+",
-"+", "+", "+", "+", "+", "-", "-", "-", "-", "-", "-", "0", "0", "0", "0",
-"0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0",
-"-", "-", "+", "+", "0", "+", "0", "-", "0", "0", "+", "0", "+", "+", "+",
-"0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0",
-"0", "0", "0", "0", "0", "0"], 
-"strid": 
-["-", "-", "+", "+", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "+", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "+", "+", "+",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-"], 
-"ATR": 
-["0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0",
-"0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0",
-"0", "-", "-", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0",
-"0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "+", "-", "+", "-",
-"+", "-", "+", "-", "-", "-", "+", "-", "+", "-", "-", "-"], 
-"cont": 
-["-","-", "+", "+", "+", "+", "+", "+", "+", "+", "-", "-", "+ ", "+", "-", "-",
-"+", "+", "+", "+", "-", "-", "+", "+", "-", "-", "+", "+", "+", "+", "+",
-"+", "-", "+", "+", "+", "+", "-", "-", "-", "-", "-", "-", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+"], 
-"d_rel": 
-["-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "+",
-"+", "+", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-"], 
-"low": 
-["0", "0", "0", "0", "0", "0", "0", "0", "0", "0",
-"-", "-", "-", "-", "0", "0", "0", "0", "0", "0", "-", "-", "-", "-", "-",
-"-", "-", "-", "0", "0", "0", "0", "0", "-", "-", "0", "0", "0", "0", "-",
-"-", "-", "-", "0", "-", "0", "0", "0", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "+", "+", "-", "-", "-", "-", "-", "-"], 
-"CG":
-["-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "+", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-"], 
-"nasal": ["-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "+", "+", "+", "+", "+", "+", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-"], 
-"lab": 
-["-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "+", "+", "+", "+", "+", "+", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+"],
-"voi": 
-["-", "+", "-", "+", "-", "+", "-", "+", "-", "+", "-", "+", "-", "+",
-"-", "+", "-", "+", "-", "+", "-", "+", "-", "+", "-", "+", "-", "+", "-",
-"-", "-", "+", "-", "-", "+", "-", "+", "+", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+", "+", "+"], 
-"tense": 
-["0", "0", "0",
-"0", "0", "0", "0", "0", "0", "0", "-", "-", "-", "-", "0", "0", "0", "0",
-"0", "0", "-", "-", "-", "-", "-", "-", "-", "-", "0", "0", "0", "0", "0",
-"-", "-", "0", "0", "0", "0", "-", "-", "-", "-", "0", "-", "0", "0", "0",
-"-", "-", "-", "-", "-", "+", "-", "+", "-", "+", "-", "+", "-", "-", "+",
-"+", "-", "+", "-", "-", "+"], 
-"lat": 
-["-", "-", "-", "-", "+", "+", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "+", "+", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-"],
-"rnd": 
-["0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0", "0",
-"0", "-", "-", "-", "-", "-", "-", "0", "0", "0", "0", "0", "0", "0", "0",
-"0", "0", "0", "0", "0", "0", "0", "0", "0", "-", "0", "0", "0", "0", "0",
-"0", "0", "0", "0", "0", "0", "-", "+", "+", "-", "-", "-", "+", "+", "-",
-"-", "+", "+", "-", "-", "+", "+", "+", "-", "+", "+"], 
-"high": 
-["0", "0",
-"0", "0", "0", "0", "0", "0", "0", "0", "+", "+", "+ ", "+", "0", "0", "0",
-"0", "0", "0", "+", "+", "+", "+", "-", "-", "-", "-", "0", "0", "0", "0",
-"0", "+", "+", "0", "0", "0", "0", "+", "-", "+", "-", "0", "+", "0", "0",
-"0", "-", "+", "+", "+", "+", "+", "+", "+", "+", "-", "-", "-", "-", "-",
-"-", "+", "+", "-", "-", "-", "+"], 
-"cor": 
-["+", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+", "+ ", "+", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "+", "+", "+",
-"-", "+", "-", "+", "-", "-", "+", "-", "+", "+", "+", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-"], 
-"phar": 
-["-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "+", "+", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+"], 
-"dor": 
-["-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "+", "+ ", "+", "-", "-",
-"-", "-", "-", "-", "+", "+", "+", "+", "+", "+", "+", "+", "-", "-", "-",
-"-", "-", "+", "+", "-", "-", "-", "-", "+", "+", "+", "+", "-", "+", "-",
-"-", "-", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+", "+",
-"+", "+", "+", "+", "+", "+", "+", "+"], 
-"SG": 
-["-", "-", "-", "-", "+", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "+", "+", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-",
-"-", "-", "-"]
-}
+# The distinctive feature matrix lives in fmatrix.csv, compiled to
+# fmatrix.bin by fmatrixutils.write_fmatrix.
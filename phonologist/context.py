@@ -0,0 +1,119 @@
+# -*- encoding: utf-8 -*-
+from constants import STRESS
+from instrument import count_scan
+
+SIDES = ( "preceding", "posterior" )
+
+
+def context_counts( tokens, targets=None, side="preceding", k=1, skip=( STRESS, ),
+					neighbours=None ):
+	"""
+	Count the k nearest symbols on one side of every target, for all
+	targets in a single pass over the transcription.
+	--------------------
+	tokens - symbols TokenArray
+	targets - list of symbols, None for every symbol
+	side - "preceding" or "posterior"
+	k - size of the context window
+	skip - symbols passed over when looking for neighbours, e.g. stress
+	neighbours - set of symbols a context may hold, None for any. A
+	context with any other symbol is not counted.
+	return - dict { target : { neighbour : frequency } }, with the k symbols
+	of a context in reading order as a tuple when k is more than 1
+	"""
+	assert side in SIDES, "side must be preceding or posterior"
+	assert k >= 1, "k must be at least 1"
+	vocabulary = tokens.vocabulary
+	if targets is None:
+		wanted = [ True ] * len( vocabulary )
+	else:
+		wanted = [ False ] * len( vocabulary )
+		for target in targets:
+			if target in vocabulary:
+				wanted[ vocabulary.ids[ target ] ] = True
+	skipped = [ symbol in skip for symbol in vocabulary.tokens ]
+	if neighbours is None:
+		allowed = [ True ] * len( vocabulary )
+	else:
+		allowed = [ symbol in neighbours for symbol in vocabulary.tokens ]
+	ids = tokens.ids
+	count_scan( len( ids ) )
+	if side == "posterior":
+		ids = reversed( ids )
+	counts = {}
+	window = []
+	for token_id in ids:
+		if wanted[ token_id ] and len( window ) == k:
+			if k == 1:
+				context = window[ 0 ]
+			elif side == "preceding":
+				context = tuple( window )
+			else:
+				context = tuple( reversed( window ) )
+			target_counts = counts.setdefault( token_id, {} )
+			target_counts[ context ] = target_counts.get( context, 0 ) + 1
+		if not skipped[ token_id ]:
+			window.append( token_id )
+			if len( window ) > k:
+				del window[ 0 ]
+	symbols = vocabulary.tokens
+	context_dict = {}
+	for token_id, target_counts in counts.iteritems():
+		neighbour_dict = {}
+		for context, frequency in target_counts.iteritems():
+			if k == 1:
+				if allowed[ context ]:
+					neighbour_dict[ symbols[ context ] ] = frequency
+			elif all( [ allowed[ ndx ] for ndx in context ] ):
+				neighbour_dict[ tuple( [ symbols[ ndx ] for ndx in context ] ) ] = frequency
+		if neighbour_dict:
+			context_dict[ symbols[ token_id ] ] = neighbour_dict
+	return context_dict
+
+def neighbour_counts( tokens, targets=None, skip=( STRESS, ) ):
+	"""
+	Count the nearest symbol on both sides of every target, for all
+	targets in a single pass over the transcription. Same counts as
+	context_counts with k=1 for each side.
+	--------------------
+	tokens - symbols TokenArray
+	targets - list of symbols, None for every symbol
+	skip - symbols passed over when looking for neighbours, e.g. stress
+	return - dict { side : { target : { neighbour : frequency } } }
+	"""
+	vocabulary = tokens.vocabulary
+	if targets is None:
+		wanted = [ True ] * len( vocabulary )
+	else:
+		wanted = [ False ] * len( vocabulary )
+		for target in targets:
+			if target in vocabulary:
+				wanted[ vocabulary.ids[ target ] ] = True
+	skipped = [ symbol in skip for symbol in vocabulary.tokens ]
+	ids = tokens.ids
+	count_scan( len( ids ) )
+	preceding = {}
+	posterior = {}
+	previous = None
+	# targets since the last symbol not skipped, waiting for their
+	# posterior neighbour
+	waiting = []
+	for token_id in ids:
+		if wanted[ token_id ] and previous is not None:
+			target_counts = preceding.setdefault( token_id, {} )
+			target_counts[ previous ] = target_counts.get( previous, 0 ) + 1
+		if not skipped[ token_id ]:
+			for target_id in waiting:
+				target_counts = posterior.setdefault( target_id, {} )
+				target_counts[ token_id ] = target_counts.get( token_id, 0 ) + 1
+			previous = token_id
+			waiting = []
+		if wanted[ token_id ]:
+			waiting.append( token_id )
+	symbols = vocabulary.tokens
+	context_dict = {}
+	for side, counts in ( ( "preceding", preceding ), ( "posterior", posterior ) ):
+		context_dict[ side ] = dict( [ ( symbols[ token_id ], dict( [ ( symbols[ neighbour ],
+			frequency ) for neighbour, frequency in target_counts.iteritems() ] ) )
+			for token_id, target_counts in counts.iteritems() ] )
+	return context_dict
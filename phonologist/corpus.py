@@ -0,0 +1,323 @@
+# -*- encoding: utf-8 -*-
+from array import array
+from itertools import imap
+from constants import SYLLABLE, STRESS, VOWELLS
+from instrument import count_scan, count_cache
+from segments import SEGMENTER, base_symbol
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# typecode of the id and offset arrays, 4 bytes per item
+TYPECODE = 'I'
+LEVELS = ( "words", "syllables", "symbols" )
+# syllable constituent -> WordType attribute holding its spans
+CONSTITUENTS = { "onset": "onsets", "nucleus": "nuclei", "coda": "codas" }
+
+
+class Vocabulary( object ):
+	"""
+	Interned tokens. Every distinct token is stored once and
+	gets a small integer id.
+	"""
+	def __init__( self, tokens=() ):
+		self.tokens = []
+		self.ids = {}
+		for token in tokens:
+			self.intern( token )
+
+	def __len__( self ):
+		return len( self.tokens )
+
+	def __contains__( self, token ):
+		return token in self.ids
+
+	def __getitem__( self, token_id ):
+		return self.tokens[ token_id ]
+
+	def intern( self, token ):
+		"""
+		Return the id of token, adding it to the vocabulary if new.
+		"""
+		try:
+			return self.ids[ token ]
+		except KeyError:
+			token_id = self.ids[ token ] = len( self.tokens )
+			self.tokens.append( token )
+			return token_id
+
+	def encode( self, tokens ):
+		"""
+		Intern a series of tokens.
+		--------------------
+		return - array [ id, ..., id ]
+		"""
+		return array( TYPECODE, imap( self.intern, tokens ) )
+
+
+class Lexicon( object ):
+	"""
+	The word, syllable and symbol vocabularies shared by every
+	object built from the same transcription. Each word type is
+	split into syllables, and each syllable type into symbols,
+	only once.
+	segmenter - splits syllables into symbols, see segments.Segmenter
+	"""
+	def __init__( self, segmenter=SEGMENTER ):
+		self.segmenter = segmenter
+		self.words = Vocabulary()
+		self.syllables = Vocabulary()
+		self.symbols = Vocabulary()
+		self._splits = { "words": [], "syllables": [] }
+		self._word_types = []
+
+	def splits( self, level ):
+		"""
+		Split the types of level one level down.
+		--------------------
+		level - "words" or "syllables"
+		return - list [ ( id, ..., id ), ... ] indexed by type id
+		"""
+		splits = self._splits[ level ]
+		vocabulary = getattr( self, level )
+		for token in vocabulary.tokens[ len( splits ): ]:
+			if level == "words":
+				parts = token.split( SYLLABLE )
+				intern = self.syllables.intern
+			else:
+				parts = self.segmenter.segments( token )
+				intern = self.symbols.intern
+			splits.append( tuple( [ intern( part ) for part in parts ] ) )
+		return splits
+
+	def word_types( self ):
+		"""
+		Parse the structure of every new word type.
+		--------------------
+		return - list [ WordType, ... ] indexed by word id
+		"""
+		word_types = self._word_types
+		splits = self.splits( "words" )
+		syllables = self.splits( "syllables" )
+		symbols = [ base_symbol( symbol ) for symbol in self.symbols.tokens ]
+		for word_id in range( len( word_types ), len( splits ) ):
+			word_types.append( WordType( splits[ word_id ], syllables, symbols ) )
+		return word_types
+
+
+class WordType( object ):
+	"""
+	The structure of one word type, parsed once and shared by all its
+	occurences. Spans are ( start, end ) pairs into symbols.
+	symbols - symbol ids of the whole word, without syllable boundries
+	syllables - syllable ids
+	syllable_spans - one span per syllable
+	stressed - index of the syllable with primary stress, None if none
+	onsets, nuclei, codas - one span per syllable. The nucleus is the
+	first run of VOWELLS, stress marks are left out of the onset.
+	"""
+	__slots__ = ( "symbols", "syllables", "syllable_spans", "stressed",
+				"onsets", "nuclei", "codas" )
+
+	def __init__( self, syllable_ids, syllable_symbols, symbol_tokens ):
+		"""
+		syllable_ids - the syllables of the word
+		syllable_symbols - symbol ids of every syllable type
+		symbol_tokens - the base symbol of every symbol id, see
+		segments.base_symbol
+		"""
+		symbols = []
+		spans, onsets, nuclei, codas = [], [], [], []
+		self.stressed = None
+		for ndx, syllable_id in enumerate( syllable_ids ):
+			start = len( symbols )
+			symbols.extend( syllable_symbols[ syllable_id ] )
+			end = len( symbols )
+			onset = start
+			while onset < end and symbol_tokens[ symbols[ onset ] ] == STRESS:
+				onset = onset + 1
+			if onset > start and self.stressed is None:
+				self.stressed = ndx
+			nucleus = onset
+			while nucleus < end and symbol_tokens[ symbols[ nucleus ] ] not in VOWELLS:
+				nucleus = nucleus + 1
+			coda = nucleus
+			while coda < end and symbol_tokens[ symbols[ coda ] ] in VOWELLS:
+				coda = coda + 1
+			spans.append( ( start, end ) )
+			onsets.append( ( onset, nucleus ) )
+			nuclei.append( ( nucleus, coda ) )
+			codas.append( ( coda, end ) )
+		self.symbols = tuple( symbols )
+		self.syllables = tuple( syllable_ids )
+		self.syllable_spans = tuple( spans )
+		self.onsets = tuple( onsets )
+		self.nuclei = tuple( nuclei )
+		self.codas = tuple( codas )
+
+	def __len__( self ):
+		return len( self.syllables )
+
+
+class TokenArray( object ):
+	"""
+	A transcription at one level ( words, syllables or symbols ) stored
+	as an array of ids into the lexicon. Reads like a list of unicode
+	tokens.
+	syllable_offsets / word_offsets - where each syllable / word starts
+	in this array, with the length at the end. None when unknown.
+	"""
+	def __init__( self, lexicon, level, ids=None, syllable_offsets=None,
+				word_offsets=None ):
+		assert level in LEVELS, "unknown level %s" % level
+		self.lexicon = lexicon
+		self.level = level
+		self.vocabulary = getattr( lexicon, level )
+		if ids is None:
+			ids = array( TYPECODE )
+		self.ids = ids
+		self.syllable_offsets = syllable_offsets
+		self.word_offsets = word_offsets
+		# offsets may be shared with copies and split layers until
+		# extend copies them, see _own_offsets
+		self._owns_offsets = False
+		self._split = None
+
+	@classmethod
+	def encode( cls, tokens, level, lexicon=None ):
+		"""
+		Build a TokenArray from unicode tokens.
+		"""
+		if lexicon is None:
+			lexicon = Lexicon()
+		token_array = cls( lexicon, level )
+		token_array.ids = token_array.vocabulary.encode( tokens )
+		return token_array
+
+	def __len__( self ):
+		return len( self.ids )
+
+	def __getitem__( self, ndx ):
+		if isinstance( ndx, slice ):
+			return map( self.vocabulary.tokens.__getitem__, self.ids[ ndx ] )
+		return self.vocabulary.tokens[ self.ids[ ndx ] ]
+
+	def __setitem__( self, ndx, token ):
+		self.ids[ ndx ] = self.vocabulary.intern( token )
+		self._split = None
+
+	def __iter__( self ):
+		return imap( self.vocabulary.tokens.__getitem__, self.ids )
+
+	def append( self, token ):
+		self.extend( [ token ] )
+
+	def extend( self, tokens, syllable_offsets=None, word_offsets=None ):
+		"""
+		Add unicode tokens at the end. The offsets already known are
+		kept and go on over the new tokens: given the offsets of the
+		new tokens those are used, else the new tokens are one new word,
+		and one new syllable for symbols.
+		"""
+		start = len( self.ids )
+		self.ids.extend( self.vocabulary.encode( tokens ) )
+		added = len( self.ids ) - start
+		self._split = None
+		if not added:
+			return
+		self._own_offsets()
+		for known, offsets in ( ( self.syllable_offsets, syllable_offsets ),
+				( self.word_offsets, word_offsets ) ):
+			if known is None:
+				continue
+			if offsets is None:
+				offsets = ( 0, added )
+			known.extend( [ start + offset for offset in offsets[ 1: ] ] )
+
+	def _own_offsets( self ):
+		"""
+		Copy the offsets shared with copies and split layers before the
+		first change, so later extends change them in place.
+		"""
+		if self._owns_offsets:
+			return
+		if self.syllable_offsets is not None:
+			self.syllable_offsets = array( TYPECODE, self.syllable_offsets )
+		if self.word_offsets is not None:
+			self.word_offsets = array( TYPECODE, self.word_offsets )
+		self._owns_offsets = True
+
+	def __eq__( self, other ):
+		if isinstance( other, basestring ):
+			return u''.join( self ) == other
+		if isinstance( other, TokenArray ) and other.vocabulary is self.vocabulary:
+			return self.ids == other.ids
+		return list( self ) == list( other )
+
+	def __ne__( self, other ):
+		return not self == other
+
+	def __repr__( self ):
+		return "TokenArray(%s, %r)" % ( self.level, list( self ) )
+
+	def as_numpy( self ):
+		"""
+		Copy of the ids as a NumPy array. Needs NumPy.
+		"""
+		dtype = numpy.dtype( 'u%d' % self.ids.itemsize )
+		return numpy.frombuffer( self.ids, dtype=dtype ).copy()
+
+	def counts( self ):
+		"""
+		Count every id of the vocabulary in one pass.
+		--------------------
+		return - [ frequency, ... ] indexed by id, a NumPy array
+		when NumPy is installed
+		"""
+		count_scan( len( self.ids ) )
+		if numpy is not None:
+			return numpy.bincount( self.as_numpy(), minlength=len( self.vocabulary ) )
+		counts = [ 0 ] * len( self.vocabulary )
+		for token_id in self.ids:
+			counts[ token_id ] += 1
+		return counts
+
+	def copy( self ):
+		"""
+		Same tokens, sharing the lexicon. Offsets and split layers are
+		shared too, extend copies the offsets before changing them.
+		"""
+		token_array = TokenArray( self.lexicon, self.level, array( TYPECODE, self.ids ),
+			self.syllable_offsets, self.word_offsets )
+		token_array._split = self._split
+		return token_array
+
+	def split( self ):
+		"""
+		Break words into syllables or syllables into symbols, working
+		on ids only. Word and syllable boundries are kept as offsets.
+		The result is built once and shared, copy it before changing it.
+		--------------------
+		return - TokenArray one level down
+		"""
+		assert self.level != "symbols", "symbols can not be split"
+		count_cache( "split", self._split is not None )
+		if self._split is None:
+			self._split = self._split_ids()
+		return self._split
+
+	def _split_ids( self ):
+		count_scan( len( self.ids ) )
+		splits = self.lexicon.splits( self.level )
+		ids = array( TYPECODE )
+		offsets = array( TYPECODE, [ 0 ] )
+		for token_id in self.ids:
+			ids.extend( splits[ token_id ] )
+			offsets.append( len( ids ) )
+		if self.level == "words":
+			return TokenArray( self.lexicon, "syllables", ids, word_offsets=offsets )
+		word_offsets = self.word_offsets
+		if word_offsets is not None:
+			word_offsets = array( TYPECODE, [ offsets[ ndx ] for ndx in word_offsets ] )
+		return TokenArray( self.lexicon, "symbols", ids, offsets, word_offsets )
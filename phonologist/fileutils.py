@@ -0,0 +1,156 @@
+# -*- encoding: utf-8 -*-
+import io
+import re
+import unicodedata
+import warnings
+from constants import IPA_SYMBOLS, STRESS, SYLLABLE, COMMA, PERIOD
+from segments import SEGMENTER, MODIFIERS, COMBINING, TIES
+
+# utf-8-sig also reads plain utf-8 and drops the BOM some editors prepend.
+ENCODING = 'utf-8-sig'
+CHUNK_SIZE = 64 * 1024
+SECONDARY_STRESS = u'\u02cc'
+# invisible characters that only get in the way of segmentation
+INVISIBLE = u'\u200b\u200c\u200d\u2060\ufeff'
+
+
+class Normalizer( object ):
+	"""
+	Clean up the output of a transcriber before it is read: Unicode
+	normalization, then single character substitutions with a table
+	compiled for unicode.translate, and invisible characters removed.
+	unicode.translate looks every character up in the table, so when
+	no replacement holds a character that is replaced the table is
+	applied with one unicode.replace per character instead.
+	Characters outside the inventory are reported.
+	form - "NFC", "NFD", "NFKC", "NFKD" or None for no normalization
+	substitutions - dict { character : replacement }
+	inventory - the symbols expected, besides marks and modifiers
+	"""
+	def __init__( self, form="NFC", substitutions=None, inventory=IPA_SYMBOLS ):
+		self.form = form
+		self.substitutions = dict( substitutions or {} )
+		table = dict( [ ( ord( char ), None ) for char in INVISIBLE ] )
+		for char, replacement in self.substitutions.iteritems():
+			assert len( char ) == 1, "substitutions replace single characters"
+			table[ ord( char ) ] = replacement
+		self.table = table
+		self._replace = None
+		replacements = u"".join( [ replacement for replacement in table.itervalues() if replacement ] )
+		if not any( [ unichr( code ) in replacements for code in table ] ):
+			self._replace = [ ( unichr( code ), replacement or u"" )
+				for code, replacement in sorted( table.iteritems() ) ]
+		known = set( inventory ) | set( [ STRESS, SECONDARY_STRESS, SYLLABLE, COMMA, PERIOD ] )
+		self.inventory = frozenset( known )
+		self._unknown = re.compile( u"[^%s%s%s%s\\s]" % ( u"".join( [ re.escape( char )
+			for char in sorted( known ) if len( char ) == 1 ] ), MODIFIERS, COMBINING, TIES ),
+			re.UNICODE )
+
+	def key( self ):
+		"""
+		Identifies the normalization, for the key of compiled corpora.
+		"""
+		return repr( ( self.form, sorted( self.substitutions.items() ), sorted( self.inventory ) ) )
+
+	def normalize( self, text ):
+		if self.form is not None:
+			text = unicodedata.normalize( self.form, text )
+		if self._replace is None:
+			return text.translate( self.table )
+		for char, replacement in self._replace:
+			if char in text:
+				text = text.replace( char, replacement )
+		return text
+
+	def count_unknown( self, text, unknown ):
+		"""
+		Add the characters of text outside the inventory to
+		unknown, a dict { character : frequency }.
+		"""
+		for char in self._unknown.findall( text ):
+			unknown[ char ] = unknown.get( char, 0 ) + 1
+
+
+# Perkins writes ASCII g for the IPA voiced velar stop
+PROFILES = {
+	"perkins": Normalizer( "NFC", { u"g": u"\u0261" } ),
+	"ipa": Normalizer( "NFC" ),
+}
+PROFILE = "perkins"
+
+
+def normalizer( profile ):
+	"""
+	profile - a PROFILES name, a Normalizer, or None for none
+	"""
+	if profile is None or isinstance( profile, Normalizer ):
+		return profile
+	return PROFILES[ profile ]
+
+
+def read_chunks( ipa_textfile, encoding=ENCODING, chunk_size=CHUNK_SIZE ):
+	"""
+	Read a transcription file as a series of unicode chunks.
+	Line endings are normalized to u'\\n'.
+	"""
+	f = io.open( ipa_textfile, "r", encoding=encoding )
+	try:
+		while True:
+			chunk = f.read( chunk_size )
+			if not chunk:
+				break
+			yield chunk
+	finally:
+		f.close()
+
+def iter_words( ipa_textfile, encoding=ENCODING, chunk_size=CHUNK_SIZE, profile=None ):
+	"""
+	Stream the whitespace separated words of every line in the file.
+	A word cut at the end of a chunk is carried over to the next one,
+	and normalized again with the rest of it.
+	profile - normalize the text as in the Normalizer of this profile,
+	see normalizer. Unknown characters are reported with a warning
+	once the file is read.
+	"""
+	normalize = normalizer( profile )
+	unknown = {}
+	tail = u''
+	for chunk in read_chunks( ipa_textfile, encoding, chunk_size ):
+		chunk = tail + chunk
+		if normalize is not None:
+			chunk = normalize.normalize( chunk )
+		words = chunk.split()
+		if words and not chunk[ -1 ].isspace():
+			tail = words.pop()
+		else:
+			tail = u''
+		if normalize is not None:
+			normalize.count_unknown( chunk[ :len( chunk ) - len( tail ) ], unknown )
+		for word in words:
+			yield word
+	if tail:
+		if normalize is not None:
+			normalize.count_unknown( tail, unknown )
+		yield tail
+	if unknown:
+		warnings.warn( "unknown symbols in %s: %s" % ( ipa_textfile, u", ".join(
+			[ u"%s (%d)" % ( char, unknown[ char ] ) for char in sorted( unknown ) ] ).encode( 'utf-8' ) ) )
+
+def iter_syllables( ipa_textfile, encoding=ENCODING, chunk_size=CHUNK_SIZE, profile=None ):
+	"""
+	Stream the syllables of every word in the file.
+	"""
+	for word in iter_words( ipa_textfile, encoding, chunk_size, profile ):
+		for syllable in word.split( SYLLABLE ):
+			yield syllable
+
+def iter_symbols( ipa_textfile, encoding=ENCODING, chunk_size=CHUNK_SIZE, profile=None ):
+	"""
+	Stream the symbols of the file, leaving out whitespace and
+	syllable boundries. Symbols are segments as in segments.Segmenter,
+	a base character with its modifiers.
+	"""
+	split = SEGMENTER.split
+	for syllable in iter_syllables( ipa_textfile, encoding, chunk_size, profile ):
+		for symbol in split( syllable ):
+			yield symbol
@@ -1,106 +1,504 @@
 # -*- encoding: utf-8 -*-
-import json
 import csv
-from constants import  ( IPA_SYMBOLS, STRESS, COMMA, PERIOD, SYLLABLE, FMATRIX )
+import json
+import os
+import threading
+import warnings
+from array import array
+from collections import OrderedDict
+from constants import  ( IPA_SYMBOLS, STRESS, COMMA, PERIOD, SYLLABLE )
+from segments import base_symbol
+from instrument import count_cache
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
+MAGIC = "PHONOLOGIST-FMATRIX\n"
+# bump when the layout of compiled feature matrices changes
+FORMAT = 1
+VALUES = { "+": 1, "-": -1, "0": 0 }
+SIGNS = { 1: "+", -1: "-", 0: "0" }
+DIRECTORY = os.path.dirname( os.path.abspath( __file__ ) )
+FMATRIX_CSV = os.path.join( DIRECTORY, "fmatrix.csv" )
+FMATRIX_PATH = os.path.join( DIRECTORY, "fmatrix.bin" )
+# natural classes kept by each FeatureMatrix, least recently used go first
+CLASS_CACHE_SIZE = 4096
 
-### perkins: -sp -ya -nomc and for words: -nospe
-def write_fmatrix():
-	f = open( "fmatrix.csv", "rb" )
-	rows = csv.reader( f )
-	feature_dict = {}
+
+class FeatureMatrix( object ):
+	"""
+	The distinctive features of an inventory of symbols, stored as one
+	signed byte per symbol and feature: 1 for +, -1 for - and 0 for 0.
+	The lookup tables are only built when first used.
+	symbols - the symbols, in row order
+	features - the features, in column order. Feature n is bit 1 << n
+	of the masks.
+	values - array('b') of the rows one after the other
+	"""
+	def __init__( self, symbols, features, values ):
+		if len( values ) != len( symbols ) * len( features ):
+			raise ValueError( "%d values for %d symbols and %d features" %
+				( len( values ), len( symbols ), len( features ) ) )
+		for name, items in ( ( "symbol", symbols ), ( "feature", features ) ):
+			if len( set( items ) ) != len( items ):
+				raise ValueError( "repeated %s in feature matrix" % name )
+		if len( values ) and ( min( values ) < -1 or max( values ) > 1 ):
+			raise ValueError( "feature values must be 1, -1 or 0" )
+		self.symbols = list( symbols )
+		self.features = list( features )
+		self.values = values
+		self._index = None
+		self._masks = None
+		self._rows = None
+		self._array = None
+		self._classes = OrderedDict()
+		self._shared = None
+		self._distances = {}
+		self._classes_lock = threading.Lock()
+
+	@classmethod
+	def from_dict( cls, fmatrix, symbols ):
+		"""
+		Build from { feature : [ value, ... ] }, values "+", "-" or "0"
+		indexed like symbols, checked as in compile_fmatrix.
+		"""
+		masks = compile_fmatrix( fmatrix, symbols )
+		features = sorted( fmatrix )
+		values = array( 'b' )
+		for ndx in range( len( symbols ) ):
+			values.extend( [ VALUES[ fmatrix[ feature ][ ndx ].strip() ] for feature in features ] )
+		matrix = cls( symbols, features, values )
+		# the masks of compile_fmatrix are the ones _compiled would build
+		matrix._masks = masks
+		return matrix
+
+	def as_dict( self ):
+		"""
+		return - dict { feature : [ "+" / "-" / "0", ... ] } indexed like symbols
+		"""
+		width = len( self.features )
+		return dict( [ ( feature, [ SIGNS[ val ] for val in self.values[ col::width ] ] )
+			for col, feature in enumerate( self.features ) ] )
+
+	@property
+	def index( self ):
+		"""
+		dict { symbol : row }
+		"""
+		if self._index is None:
+			self._index = dict( [ ( symbol, ndx ) for ndx, symbol in enumerate( self.symbols ) ] )
+		return self._index
+
+	@property
+	def no_features( self ):
+		"""
+		Row of the symbols without features, the last one of rows / array.
+		"""
+		return len( self.symbols )
+
+	@property
+	def feature_bits( self ):
+		return self._compiled()[ 0 ]
+
+	@property
+	def plus_masks( self ):
+		return self._compiled()[ 1 ]
+
+	@property
+	def minus_masks( self ):
+		return self._compiled()[ 2 ]
+
+	@property
+	def zero_masks( self ):
+		return self._compiled()[ 3 ]
+
+	def _compiled( self ):
+		if self._masks is None:
+			width = len( self.features )
+			masks = { 1: [ 0 ] * len( self.symbols ), -1: [ 0 ] * len( self.symbols ),
+				0: [ 0 ] * len( self.symbols ) }
+			for ndx in range( len( self.symbols ) ):
+				for col, val in enumerate( self.values[ ndx * width:( ndx + 1 ) * width ] ):
+					masks[ val ][ ndx ] |= 1 << col
+			feature_bits = dict( [ ( feature, 1 << col ) for col, feature in enumerate( self.features ) ] )
+			self._masks = ( feature_bits, masks[ 1 ], masks[ -1 ], masks[ 0 ] )
+		return self._masks
+
+	@property
+	def rows( self ):
+		"""
+		One tuple of 1, -1 and 0 per symbol, columns in features order,
+		plus a last row of 0 for no_features.
+		"""
+		if self._rows is None:
+			width = len( self.features )
+			self._rows = [ tuple( self.values[ ndx * width:( ndx + 1 ) * width ] )
+				for ndx in range( len( self.symbols ) ) ]
+			self._rows.append( ( 0, ) * width )
+		return self._rows
+
+	@property
+	def array( self ):
+		"""
+		rows as a numpy int8 array, None when NumPy is not installed.
+		"""
+		if self._array is None and numpy is not None:
+			self._array = numpy.array( self.rows, dtype=numpy.int8 ).reshape(
+				len( self.symbols ) + 1, len( self.features ) )
+		return self._array
+
+	def value( self, symbol, feature ):
+		"""
+		return - "+", "-" or "0"
+		"""
+		col = self.features.index( feature )
+		return SIGNS[ self.rows[ self.row( symbol ) ][ col ] ]
+
+	def row( self, symbol ):
+		"""
+		The row of symbol, or of its NFC or NFD form or its base symbol
+		( see segments.base_symbol ) when the segment itself is not in
+		the matrix. Marks and unknown symbols get no_features, they have
+		no + or - value and are in no natural class.
+		"""
+		try:
+			return self.index[ symbol ]
+		except KeyError:
+			return self.index.get( base_symbol( symbol, self.index ), self.no_features )
+
+	def mask( self, features ):
+		"""
+		Bitmask with the bit of every feature in features set.
+		"""
+		feature_bits = self.feature_bits
+		mask = 0
+		for feature in features:
+			mask |= feature_bits[ feature ]
+		return mask
+
+	def natural_class( self, plus=(), minus=() ):
+		"""
+		The symbols of the matrix with a + for every feature in plus and
+		a - for every feature in minus. Classes only depend on the matrix,
+		so the last CLASS_CACHE_SIZE are kept, whatever order the
+		features come in.
+		--------------------------
+		return frozenset ([ sym, ..., sym ])
+		"""
+		key = ( frozenset( plus ), frozenset( minus ) )
+		with self._classes_lock:
+			members = self._classes.pop( key, None )
+			count_cache( "natural_class", members is not None )
+			if members is None:
+				members = self._natural_class( *key )
+				if len( self._classes ) >= CLASS_CACHE_SIZE:
+					self._classes.popitem( last=False )
+			self._classes[ key ] = members
+		return members
+
+	def _natural_class( self, plus, minus ):
+		plus_mask = self.mask( plus )
+		minus_mask = self.mask( minus )
+		return frozenset( [ symbol for symbol, plus, minus in
+			zip( self.symbols, self.plus_masks, self.minus_masks )
+			if plus & plus_mask == plus_mask and minus & minus_mask == minus_mask ] )
+
+	def find_class( self, data, plus=(), minus=() ):
+		"""
+		Find the symbols of data in the natural class with a + for every
+		feature in plus and a - for every feature in minus, intersecting
+		data with the cached class. Segments not in the matrix go by their
+		base symbol, marks and unknown symbols are never in a class ( see
+		row ).
+		--------------------------
+		data - symbols ( any iterable, duplicates are fine )
+		return set ([ sym, ..., sym ])
+		"""
+		members = self.natural_class( plus, minus )
+		data = set( data )
+		found = data & members
+		no_features = self.no_features
+		for symbol in data.difference( self.index ).difference( MARKS ):
+			ndx = self.row( symbol )
+			if ndx != no_features and self.symbols[ ndx ] in members:
+				found.add( symbol )
+		return found
+
+	def class_rows( self, plus=(), minus=() ):
+		"""
+		Whether each row of rows is in the natural class with + for
+		every feature in plus and - for every feature in minus.
+		"""
+		members = self.natural_class( plus, minus )
+		rows = [ symbol in members for symbol in self.symbols ]
+		rows.append( False )
+		return rows
+
+	def indexes( self, symbols ):
+		"""
+		The row of every symbol, see row. Marks and unknown symbols get
+		no_features, the all 0 row.
+		"""
+		return map( self.row, symbols )
+
+	def features_in_common( self, *symbols ):
+		"""
+		The features every one of symbols has with the same + or - value,
+		none when one of them is a mark or unknown ( see row ).
+		--------------------------
+		return - dict { feature : "+" / "-" }
+		"""
+		rows = [ self.row( symbol ) for symbol in symbols ]
+		if not rows or self.no_features in rows:
+			return {}
+		plus = minus = ( 1 << len( self.features ) ) - 1
+		for ndx in rows:
+			plus &= self.plus_masks[ ndx ]
+			minus &= self.minus_masks[ ndx ]
+		common = {}
+		for feature, bit in self.feature_bits.iteritems():
+			if plus & bit:
+				common[ feature ] = "+"
+			elif minus & bit:
+				common[ feature ] = "-"
+		return common
+
+	def shared( self ):
+		"""
+		How many features each pair of symbols have with the same + or -
+		value. Built once.
+		--------------------------
+		return - rows x rows numpy int array, or a list of lists when
+		NumPy is not installed, no_features included
+		"""
+		if self._shared is None:
+			if numpy is not None:
+				values = self.array
+				plus = ( values == 1 ).astype( numpy.int32 )
+				minus = ( values == -1 ).astype( numpy.int32 )
+				self._shared = plus.dot( plus.T ) + minus.dot( minus.T )
+			else:
+				masks = zip( self.plus_masks, self.minus_masks ) + [ ( 0, 0 ) ]
+				self._shared = [ [ bin( plus & other_plus ).count( "1" ) + bin( minus & other_minus ).count( "1" )
+					for other_plus, other_minus in masks ] for plus, minus in masks ]
+		return self._shared
+
+	def distances( self, weights=None ):
+		"""
+		Weighted feature distance between each pair of symbols: the sum of
+		the weights of the features they differ in, half a weight when
+		one of the values is 0. Built once for each weights.
+		--------------------------
+		weights - dict { feature : weight }, 1 for features left out
+		return - rows x rows numpy float array, or a list of lists when
+		NumPy is not installed, no_features included
+		"""
+		key = None
+		if weights:
+			unknown = set( weights ).difference( self.features )
+			assert not unknown, "unknown features %s" % ", ".join( sorted( unknown ) )
+			key = tuple( [ float( weights.get( feature, 1 ) ) for feature in self.features ] )
+		if key not in self._distances:
+			column_weights = key or ( 1.0, ) * len( self.features )
+			if numpy is not None:
+				values = self.array.astype( numpy.float64 )
+				matrix = numpy.zeros( ( len( values ), len( values ) ) )
+				for col, weight in enumerate( column_weights ):
+					if weight:
+						column = values[ :, col ]
+						matrix += weight * numpy.abs( column[ :, None ] - column[ None, : ] ) / 2
+			else:
+				rows = self.rows
+				matrix = [ [ sum( [ weight * abs( val - other_val ) / 2.0 for weight, val, other_val
+					in zip( column_weights, row, other ) ] ) for other in rows ] for row in rows ]
+			self._distances[ key ] = matrix
+		return self._distances[ key ]
+
+	def distance( self, symbol, other, weights=None ):
+		"""
+		Weighted feature distance between two symbols, see distances.
+		Marks and unknown symbols have no features, see row.
+		"""
+		return float( self.distances( weights )[ self.row( symbol ) ][ self.row( other ) ] )
+
+	def similarity( self, symbol, other, weights=None ):
+		"""
+		1 for symbols with the same features down to 0 for symbols
+		differing in every feature, see distances. Every symbol is the
+		same as any other when the weights add up to 0.
+		"""
+		distance = self.distance( symbol, other, weights )
+		total = len( self.features )
+		if weights:
+			total = sum( [ weights.get( feature, 1 ) for feature in self.features ] )
+		if not total:
+			return 1.0
+		return 1.0 - distance / total
+
+	def nearest( self, symbol, k=1, candidates=None, weights=None ):
+		"""
+		The k symbols closest to symbol in feature distance.
+		--------------------------
+		candidates - symbols to choose from, every symbol of the matrix
+		if None. symbol itself and marks are left out, unknown symbols
+		have no features ( see row ).
+		return - list [ ( symbol, distance ), ... ], closest first
+		"""
+		row = self.distances( weights )[ self.row( symbol ) ]
+		if candidates is None:
+			candidates = self.symbols
+		found = []
+		for candidate in set( candidates ).difference( MARKS ):
+			if candidate != symbol:
+				found.append( ( float( row[ self.row( candidate ) ] ), candidate ) )
+		found.sort()
+		return [ ( candidate, distance ) for distance, candidate in found[ :k ] ]
+
+	def write( self, path ):
+		"""
+		Write the compiled matrix: a magic line, a json header line with
+		the symbols and features, then the values as raw bytes.
+		"""
+		header = { "format": FORMAT, "symbols": self.symbols, "features": self.features }
+		f = open( path, "wb" )
+		try:
+			f.write( MAGIC )
+			f.write( json.dumps( header ) + "\n" )
+			self.values.tofile( f )
+		finally:
+			f.close()
+
+
+def load_fmatrix( path=FMATRIX_PATH ):
+	"""
+	Read a matrix written by FeatureMatrix.write. Raises ValueError for
+	files of another kind or format, or with missing or bad values.
+	--------------------------
+	return - FeatureMatrix
+	"""
+	f = open( path, "rb" )
+	try:
+		if f.readline() != MAGIC:
+			raise ValueError( "%s is not a compiled feature matrix" % path )
+		header = json.loads( f.readline() )
+		if header.get( "format" ) != FORMAT:
+			raise ValueError( "%s has format %s, expected %d" % ( path, header.get( "format" ), FORMAT ) )
+		values = array( 'b' )
+		try:
+			values.fromfile( f, len( header[ "symbols" ] ) * len( header[ "features" ] ) )
+		except EOFError:
+			raise ValueError( "%s is truncated" % path )
+		if f.read( 1 ):
+			raise ValueError( "%s has trailing data" % path )
+	finally:
+		f.close()
+	return FeatureMatrix( header[ "symbols" ], [ str( feature ) for feature in header[ "features" ] ], values )
+
+def read_csv( csv_path=FMATRIX_CSV, symbols=None ):
+	"""
+	Read a feature matrix from a csv file with one row per feature:
+	the feature name, then its value for every symbol. A first row
+	starting with "symbols" lists the symbols of the columns, otherwise
+	they are symbols ( IPA_SYMBOLS by default ).
+	--------------------------
+	return - FeatureMatrix
+	"""
+	f = open( csv_path, "rb" )
+	try:
+		rows = [ row for row in csv.reader( f ) if row ]
+	finally:
+		f.close()
+	if rows and rows[ 0 ][ 0 ] == "symbols":
+		symbols = [ symbol.decode( 'utf-8' ) for symbol in rows.pop( 0 )[ 1: ] ]
+	elif symbols is None:
+		symbols = IPA_SYMBOLS
+	fmatrix = {}
 	for row in rows:
-		temp_list = []
-		feature = row[ 0 ]
-		for ind in row[ 1: ]:
-			temp_list.append( ind )
-		feature_dict[feature] = temp_list
-	feature_matrix = json.dumps( feature_dict )
-	f.close()
-	json_file = open( "fmatrix.json", "w" )
-	json.dump( feature_matrix, json_file )
-
-def build_fmatrix():
-	f = open("fmatrix.json","r")
-	feature_matrix = json.load(f)
-	f.close()
-	return json.loads(feature_matrix)
+		if row[ 0 ] in fmatrix:
+			raise ValueError( "feature %s repeated in %s" % ( row[ 0 ], csv_path ) )
+		fmatrix[ row[ 0 ] ] = row[ 1: ]
+	return FeatureMatrix.from_dict( fmatrix, symbols )
+
+### perkins: -sp -ya -nomc and for words: -nospe
+def write_fmatrix( csv_path=FMATRIX_CSV, path=FMATRIX_PATH, symbols=None ):
+	"""
+	Compile the csv feature matrix into the binary one loaded on
+	import. Run again after editing fmatrix.csv.
+	"""
+	read_csv( csv_path, symbols ).write( path )
+
+def build_fmatrix( path=FMATRIX_PATH ):
+	"""
+	return - dict { feature : [ "+" / "-" / "0", ... ] } of a compiled matrix
+	"""
+	return load_fmatrix( path ).as_dict()
 
 def get_features(ipa_symbol):
 	ipa_symbol = force_unicode(ipa_symbol)
-	ndx = IPA_DICT[ ipa_symbol ]
 	fdict = {}
-	for feature in FMATRIX:
-		val = FMATRIX[ feature ][ndx]
-		fdict[ feature ] = val
+	for feature in FEATURES:
+		fdict[ feature ] = FEATURE_MATRIX.value( ipa_symbol, feature )
 	output = { ipa_symbol : fdict }
 	### more print magic here
 	return output
 
 def features( phon_trans, posfeatures=None, negfeatures=None ):
-	if posfeatures:
-		if negfeatures:
-			data = find_plus( phon_trans, posfeatures )
-			return find_minus(phon_trans, negfeatures, data_arg=data )
-		else:
-			return find_plus( phon_trans, posfeatures )
-	else:
-		return find_minus( phon_trans, negfeatures )
+	return find_class( phon_trans.tokens, posfeatures or [], negfeatures or [] )
 
 def find_plus( phon_trans, posfeatures ):
 	assert type(posfeatures) == list, "posfeatures must be passed as list [ ] "
-	ndx = len(posfeatures) - 1
-	data = ''.join(phon_trans.tokens)
-	while ndx >= 0:
-		feature = posfeatures[ndx]
-		n_data = _find_pos( feature, data )
-		data = n_data
-		ndx -= 1
-	output = set( data )
-	return output
+	return find_class( phon_trans.tokens, plus=posfeatures )
 
 def find_minus( phon_trans, negfeatures, data_arg=None ):
 	assert type(negfeatures) == list, "negfeatures must be passed as list [ ] "
-	ndx = len(negfeatures) - 1
 	if data_arg:
-		data = list(data_arg)
+		data = data_arg
 	else:
-		data = ''.join(phon_trans.tokens)
-	while ndx >= 0:
-		feature = negfeatures[ndx]
-		n_data = _find_neg( feature, data )
-		data = n_data
-		ndx -= 1
-	output = set( data )
-	return output
+		data = phon_trans.tokens
+	return find_class( data, minus=negfeatures )
 
-def find_pos( feature, data  ):
+def find_class( data, plus=(), minus=() ):
 	"""
-	Used in Features class to find positive features in the fmatrix.
+	FeatureMatrix.find_class in the default matrix.
+	--------------------------
+	data - symbols ( any iterable, duplicates are fine )
+	return set ([ sym, ..., sym ])
 	"""
-	f_list = FMATRIX[ feature ]
-	found = []
-	for symbol in data:
-		if symbol not in [ COMMA,PERIOD,STRESS,SYLLABLE ]:
-			ndx = IPA_DICT[ symbol ]
-			val = f_list[ ndx ]
-			if val == "+":
-				found.append( symbol )
-	return found
+	return FEATURE_MATRIX.find_class( data, plus, minus )
 
-def find_neg( feature, data ):
+def compile_fmatrix( fmatrix, symbols ):
 	"""
-	Used in Features class to find negative features in the fmatrix.
+	Compile a feature matrix { feature : [ value, ... ] } into bitmasks,
+	one bit per feature. Values must be "+", "-" or "0". A value with
+	stray whitespace is read stripped and reported with a warning; any
+	other value, or a row that does not match symbols, is an error.
+	--------------------------
+	symbols - the symbols the rows are indexed by
+	return - ( { feature : bit }, plus masks, minus masks, zero masks )
+	with the masks indexed like symbols
 	"""
-	f_list = FMATRIX[ feature ]
-	found = []
-	for symbol in data:
-		if symbol not in [ COMMA,PERIOD,STRESS,SYLLABLE ]:
-			ndx = IPA_DICT[ symbol ]
-			val = f_list[ ndx ]
-			if val == "-":
-				found.append(symbol)
-	return found	
+	feature_bits = {}
+	plus_masks = [ 0 ] * len( symbols )
+	minus_masks = [ 0 ] * len( symbols )
+	zero_masks = [ 0 ] * len( symbols )
+	masks = { "+": plus_masks, "-": minus_masks, "0": zero_masks }
+	for bit, feature in enumerate( sorted( fmatrix ) ):
+		row = fmatrix[ feature ]
+		if len( row ) != len( symbols ):
+			raise ValueError( "feature %s has %d values for %d symbols" %
+				( feature, len( row ), len( symbols ) ) )
+		feature_bits[ feature ] = 1 << bit
+		for ndx, val in enumerate( row ):
+			if val not in masks:
+				if val.strip() not in masks:
+					raise ValueError( "feature %s has value %r for symbol %s" %
+						( feature, val, symbols[ ndx ].encode( 'utf-8' ) ) )
+				warnings.warn( "feature %s has value %r for symbol %s" %
+					( feature, val, symbols[ ndx ].encode( 'utf-8' ) ) )
+				val = val.strip()
+			masks[ val ][ ndx ] |= 1 << bit
+	return feature_bits, plus_masks, minus_masks, zero_masks
 
 def ipa_symbols():
 	return IPA_SYMBOLS
@@ -117,5 +515,16 @@ def force_unicode(token):
 	else:
 		return token
 		
-IPA_DICT = ipa_dict()
+def default_fmatrix():
+	"""
+	The compiled fmatrix.bin, or fmatrix.csv when it was not compiled.
+	"""
+	if os.path.exists( FMATRIX_PATH ):
+		return load_fmatrix( FMATRIX_PATH )
+	return read_csv( FMATRIX_CSV )
 
+# boundry and stress marks, which have no features
+MARKS = frozenset([ COMMA, PERIOD, STRESS, SYLLABLE ])
+FEATURE_MATRIX = default_fmatrix()
+# column order of FEATURE_MATRIX.rows / FEATURE_MATRIX.array
+FEATURES = FEATURE_MATRIX.features
@@ -0,0 +1,184 @@
+# -*- encoding: utf-8 -*-
+"""
+Opt-in instrumentation of the query methods: call counts, wall time,
+tokens scanned and cache hits / misses.
+
+	>>> with instrumentation() as stats:
+	...     EnvironmentReport( targets ).run( files, "report.csv" )
+	>>> stats.dump_csv( "stats.csv" )
+
+The methods are only wrapped while instrumentation is enabled, so a
+disabled run executes the original code. The scan and cache hooks
+cost one function call when disabled.
+Not thread safe, enable it in single threaded runs only.
+"""
+import cProfile
+import csv
+import json
+import pstats
+import timeit
+from contextlib import contextmanager
+from functools import wraps
+
+# the Stats being filled, None when disabled
+_stats = None
+# ( class, name, original function ) of every wrapped method
+_wrapped = []
+
+
+class Stats( object ):
+	"""
+	methods - dict { "Class.method" : { calls, seconds, scans, scanned } },
+	seconds include the time spent in nested instrumented methods while
+	scans and scanned tokens go to the innermost method only
+	caches - dict { cache : { hits, misses } }
+	"""
+	FIELDS = ( "calls", "seconds", "scans", "scanned" )
+
+	def __init__( self ):
+		self.methods = {}
+		self.caches = {}
+		self._stack = []
+
+	def _method( self, name ):
+		try:
+			return self.methods[ name ]
+		except KeyError:
+			record = self.methods[ name ] = dict( [ ( field, 0 ) for field in self.FIELDS ] )
+			return record
+
+	def scan( self, tokens ):
+		if self._stack:
+			record = self._method( self._stack[ -1 ] )
+		else:
+			record = self._method( "<outside>" )
+		record[ "scans" ] += 1
+		record[ "scanned" ] += tokens
+
+	def cache( self, name, hit ):
+		record = self.caches.setdefault( name, { "hits": 0, "misses": 0 } )
+		record[ "hits" if hit else "misses" ] += 1
+
+	def as_dict( self ):
+		return { "methods": self.methods, "caches": self.caches }
+
+	def dump_json( self, path ):
+		f = open( path, "w" )
+		try:
+			json.dump( self.as_dict(), f, indent=1, sort_keys=True )
+		finally:
+			f.close()
+
+	def dump_csv( self, path ):
+		"""
+		One row per method, then one row per cache.
+		"""
+		f = open( path, "wb" )
+		try:
+			writer = csv.writer( f )
+			writer.writerow( ( "method", ) + self.FIELDS )
+			for name, record in sorted( self.methods.iteritems() ):
+				writer.writerow( [ name ] + [ record[ field ] for field in self.FIELDS ] )
+			writer.writerow( ( "cache", "hits", "misses" ) )
+			for name, record in sorted( self.caches.iteritems() ):
+				writer.writerow( ( name, record[ "hits" ], record[ "misses" ] ) )
+		finally:
+			f.close()
+
+
+def count_scan( tokens ):
+	"""
+	Hook for the code that reads every token of a transcription.
+	"""
+	if _stats is not None:
+		_stats.scan( tokens )
+
+def count_cache( name, hit ):
+	"""
+	Hook for lazily built tables: hit is True when already built.
+	"""
+	if _stats is not None:
+		_stats.cache( name, hit )
+
+def _instrumented( name, function ):
+	@wraps( function )
+	def wrapper( self, *args, **kwargs ):
+		stats = _stats
+		if stats is None:
+			return function( self, *args, **kwargs )
+		key = "%s.%s" % ( type( self ).__name__, name )
+		stats._stack.append( key )
+		start = timeit.default_timer()
+		try:
+			return function( self, *args, **kwargs )
+		finally:
+			seconds = timeit.default_timer() - start
+			stats._stack.pop()
+			record = stats._method( key )
+			record[ "calls" ] += 1
+			record[ "seconds" ] += seconds
+	return wrapper
+
+def _classes():
+	from phonologist import ( BasePhonologist, BaseTokens, Words, Syllables, Symbols,
+							Features, Vowels )
+	return ( BasePhonologist, BaseTokens, Words, Syllables, Symbols, Features, Vowels )
+
+def enable( stats=None ):
+	"""
+	Start recording into stats, a new Stats if None. Wraps the public
+	methods of the phonologist classes.
+	--------------------
+	return - Stats
+	"""
+	global _stats
+	if _stats is not None:
+		disable()
+	for cls in _classes():
+		for name, function in cls.__dict__.items():
+			if not name.startswith( "_" ) and callable( function ):
+				_wrapped.append( ( cls, name, function ) )
+				setattr( cls, name, _instrumented( name, function ) )
+	_stats = stats if stats is not None else Stats()
+	return _stats
+
+def disable():
+	"""
+	Stop recording and put back the original methods.
+	--------------------
+	return - the Stats recorded, None if not enabled
+	"""
+	global _stats
+	while _wrapped:
+		cls, name, function = _wrapped.pop()
+		setattr( cls, name, function )
+	stats, _stats = _stats, None
+	return stats
+
+@contextmanager
+def instrumentation( stats=None ):
+	"""
+	Record the calls made in a with block.
+	"""
+	stats = enable( stats )
+	try:
+		yield stats
+	finally:
+		disable()
+
+@contextmanager
+def profiled( path=None, sort="cumulative", limit=30 ):
+	"""
+	Run a with block under cProfile. The profile is written to path
+	when given, else the top limit functions are printed.
+	"""
+	profile = cProfile.Profile()
+	profile.enable()
+	try:
+		yield profile
+	finally:
+		profile.disable()
+		if path is not None:
+			profile.dump_stats( path )
+		else:
+			pstats.Stats( profile ).sort_stats( sort ).print_stats( limit )
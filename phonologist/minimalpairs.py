@@ -0,0 +1,113 @@
+# -*- encoding: utf-8 -*-
+from corpus import CONSTITUENTS
+from constants import STRESS, COMMA, PERIOD
+
+# stands for the segment left out of a neighbourhood key
+WILDCARD = -1
+POSITIONS = ( "onset", "nucleus", "coda", "stressed", "unstressed" )
+
+
+class NeighbourhoodIndex( object ):
+	"""
+	Word types keyed by their one segment wildcard variants: ˈka.sa is
+	filed under ( *, a, s, a ), ( k, *, s, a ), ( k, a, *, a ) and
+	( k, a, s, * ). Two types differing in one segment share a key, so
+	minimal pairs come from the keys instead of comparing every pair of
+	types. Stress marks are left out of the segments, types with
+	phrase marks are left out altogether.
+	segments - dict { word id : ( symbol ids, their indexes in WordType.symbols ) }
+	keys - dict { key : [ word id, ... ] }
+	"""
+	def __init__( self, lexicon, word_ids ):
+		self.lexicon = lexicon
+		symbols = lexicon.symbols
+		word_types = self.word_types = lexicon.word_types()
+		stress = symbols.ids.get( STRESS )
+		marks = set( [ symbols.ids[ mark ] for mark in ( COMMA, PERIOD ) if mark in symbols ] )
+		self.segments = {}
+		self.keys = {}
+		for word_id in word_ids:
+			word_type = word_types[ word_id ]
+			if marks.intersection( word_type.symbols ):
+				continue
+			positions = tuple( [ ndx for ndx, symbol_id in enumerate( word_type.symbols )
+				if symbol_id != stress ] )
+			segments = tuple( [ word_type.symbols[ ndx ] for ndx in positions ] )
+			self.segments[ word_id ] = ( segments, positions )
+			for ndx in range( len( segments ) ):
+				key = segments[ :ndx ] + ( WILDCARD, ) + segments[ ndx + 1: ]
+				self.keys.setdefault( key, [] ).append( word_id )
+
+	def pairs( self, position=None, contrasts=None ):
+		"""
+		Every pair of word types differing in exactly one segment.
+		--------------------
+		position - "onset", "nucleus", "coda", "stressed" or "unstressed",
+		where the contrasting segments must be in both words, None for anywhere
+		contrasts - symbols both contrasting segments must be in, None for any
+		return - sorted list [ ( word, word, symbol, symbol ), ... ], the
+		words of a pair in order, each followed by its contrasting segment
+		"""
+		assert position is None or position in POSITIONS, "unknown position %s" % position
+		words = self.lexicon.words.tokens
+		symbols = self.lexicon.symbols.tokens
+		found = []
+		for key, word_ids in self.keys.iteritems():
+			if len( word_ids ) < 2:
+				continue
+			ndx = key.index( WILDCARD )
+			for i, word_id in enumerate( word_ids ):
+				symbol = symbols[ self.segments[ word_id ][ 0 ][ ndx ] ]
+				for other_id in word_ids[ i + 1: ]:
+					other = symbols[ self.segments[ other_id ][ 0 ][ ndx ] ]
+					# the same segments, different stress
+					if symbol == other:
+						continue
+					if contrasts is not None and ( symbol not in contrasts or other not in contrasts ):
+						continue
+					if position is not None and not ( self.in_position( word_id, ndx, position )
+							and self.in_position( other_id, ndx, position ) ):
+						continue
+					if words[ word_id ] < words[ other_id ]:
+						found.append( ( words[ word_id ], words[ other_id ], symbol, other ) )
+					else:
+						found.append( ( words[ other_id ], words[ word_id ], other, symbol ) )
+		found.sort()
+		return found
+
+	def in_position( self, word_id, ndx, position ):
+		"""
+		Whether segment ndx of a word type is in position, see pairs.
+		"""
+		word_type = self.word_types[ word_id ]
+		symbol_ndx = self.segments[ word_id ][ 1 ][ ndx ]
+		for syllable, ( start, end ) in enumerate( word_type.syllable_spans ):
+			if start <= symbol_ndx < end:
+				break
+		if position == "stressed":
+			return syllable == word_type.stressed
+		if position == "unstressed":
+			return syllable != word_type.stressed
+		start, end = getattr( word_type, CONSTITUENTS[ position ] )[ syllable ]
+		return start <= symbol_ndx < end
+
+	def neighbours( self, segments ):
+		"""
+		The word types one segment away from a sequence of segments.
+		--------------------
+		segments - symbols, without stress marks
+		return - dict { word : ( symbol, symbol ) }, the segment of
+		segments and the one of word that differ
+		"""
+		ids = self.lexicon.symbols.ids
+		segment_ids = tuple( [ ids.get( segment, WILDCARD - 1 ) for segment in segments ] )
+		words = self.lexicon.words.tokens
+		symbols = self.lexicon.symbols.tokens
+		found = {}
+		for ndx in range( len( segment_ids ) ):
+			key = segment_ids[ :ndx ] + ( WILDCARD, ) + segment_ids[ ndx + 1: ]
+			for word_id in self.keys.get( key, () ):
+				other = symbols[ self.segments[ word_id ][ 0 ][ ndx ] ]
+				if other != segments[ ndx ]:
+					found[ words[ word_id ] ] = ( segments[ ndx ], other )
+		return found
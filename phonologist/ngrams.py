@@ -0,0 +1,278 @@
+# -*- encoding: utf-8 -*-
+"""
+Phonotactic n-gram tables: the counts of every n-gram of symbols or
+syllables for n = 1 up to an order, with the word edges as a unit of
+their own, so # k counts word initial k and a # word final a.
+
+	>>> table = Symbols.loadfile( "speaker.txt" ).ngrams( 3 )
+	>>> table.probability( ( u"#", u"k", u"a" ) )
+	>>> table.scores( [ u"ˈka.sa", u"ˈta.ka" ] )
+
+Each n-gram is packed into one integer, the ids of its units as the
+digits of a number in base len( vocabulary ) + 2, so the tables are
+sorted key and count arrays with NumPy, dicts without.
+"""
+import math
+from array import array
+from itertools import chain
+from constants import SYLLABLE
+from instrument import count_scan
+from fmatrixutils import numpy
+
+BOUNDARY = u"#"
+
+
+class NgramTable( object ):
+	"""
+	N-gram counts of a symbols or syllables TokenArray, built in one
+	pass, or one vectorized pass per n with NumPy. N-grams never span
+	a word edge, they can only start or end on one. Without word
+	offsets the transcription is one word.
+	order - the longest n-grams counted
+	skip - symbols left out, e.g. stress and syllable marks
+	"""
+	def __init__( self, tokens, order=2, skip=() ):
+		assert order >= 1, "order must be at least 1"
+		self.order = order
+		self.level = tokens.level
+		self.lexicon = tokens.lexicon
+		self.vocabulary = tokens.vocabulary
+		self.skip = frozenset( skip )
+		self._skipped = frozenset( [ self.vocabulary.ids[ symbol ] for symbol in skip
+			if symbol in self.vocabulary ] )
+		# units interned after the table was built are unknown to it
+		self.boundary = len( self.vocabulary )
+		self.unknown = self.boundary + 1
+		self.base = self.boundary + 2
+		self.vectorized = numpy is not None and self.base ** order < 2 ** 63
+		# counts[ n ] the n-gram counts, histories[ n ] the number of
+		# n-grams following each ( n - 1 )-gram, both by packed key
+		self.counts = {}
+		self.histories = {}
+		self.total = 0
+		if self.vectorized:
+			self._build_numpy( tokens )
+		else:
+			self._build( tokens )
+
+	def _sequence( self, tokens ):
+		"""
+		The ids of tokens with the word edges in between, skipped ids
+		left out and no two edges in a row.
+		"""
+		ids = tokens.ids
+		count_scan( len( ids ) )
+		offsets = tokens.word_offsets
+		if offsets is None:
+			offsets = ( 0, len( ids ) )
+		sequence = array( 'l', [ self.boundary ] )
+		for ndx in range( len( offsets ) - 1 ):
+			for token_id in ids[ offsets[ ndx ]:offsets[ ndx + 1 ] ]:
+				if token_id not in self._skipped:
+					sequence.append( token_id )
+			if sequence[ -1 ] != self.boundary:
+				sequence.append( self.boundary )
+		return sequence
+
+	def _build( self, tokens ):
+		sequence = self._sequence( tokens )
+		self.total = len( sequence )
+		counts = [ {} for n in range( self.order ) ]
+		# keys of the n-grams ending at the unit before, by n - 1
+		previous = []
+		for token_id in sequence:
+			keys = [ token_id ]
+			for key in previous[ :self.order - 1 ]:
+				keys.append( key * self.base + token_id )
+			for n_counts, key in zip( counts, keys ):
+				n_counts[ key ] = n_counts.get( key, 0 ) + 1
+			# n-grams only go on from a word edge when they start on it
+			previous = keys if token_id != self.boundary else [ token_id ]
+		for n, n_counts in enumerate( counts ):
+			self.counts[ n + 1 ] = n_counts
+			histories = self.histories[ n + 1 ] = {}
+			for key, frequency in n_counts.iteritems():
+				histories[ key // self.base ] = histories.get( key // self.base, 0 ) + frequency
+
+	def _build_numpy( self, tokens ):
+		ids = tokens.as_numpy().astype( numpy.int64 )
+		count_scan( len( ids ) )
+		offsets = tokens.word_offsets
+		if offsets is None:
+			offsets = ( 0, len( ids ) )
+		sequence = numpy.insert( ids, numpy.asarray( offsets, dtype=numpy.intp ), self.boundary )
+		if self._skipped:
+			sequence = sequence[ ~numpy.in1d( sequence, list( self._skipped ) ) ]
+		edges = sequence == self.boundary
+		sequence = sequence[ numpy.r_[ True, ~( edges[ 1: ] & edges[ :-1 ] ) ] ]
+		edges = sequence == self.boundary
+		self.total = len( sequence )
+		for n in range( 1, self.order + 1 ):
+			length = len( sequence ) - n + 1
+			if length <= 0:
+				keys = numpy.zeros( 0, dtype=numpy.int64 )
+			else:
+				keys = sequence[ :length ].copy()
+				inside = numpy.zeros( length, dtype=bool )
+				for ndx in range( 1, n ):
+					keys = keys * self.base + sequence[ ndx:ndx + length ]
+					if ndx < n - 1:
+						inside |= edges[ ndx:ndx + length ]
+				keys = keys[ ~inside ]
+			keys, counts = numpy.unique( keys, return_counts=True )
+			self.counts[ n ] = ( keys, counts )
+			# the keys are sorted so n-grams with the same history are together
+			histories, starts = numpy.unique( keys // self.base, return_index=True )
+			if len( keys ):
+				self.histories[ n ] = ( histories, numpy.add.reduceat( counts, starts ) )
+			else:
+				self.histories[ n ] = ( histories, counts[ :0 ] )
+
+	def _pack( self, ids ):
+		key = 0
+		for token_id in ids:
+			key = key * self.base + token_id
+		return key
+
+	def _lookup( self, table, keys ):
+		"""
+		The values of a table for keys, 0 for missing keys.
+		"""
+		if not self.vectorized:
+			return [ table.get( key, 0 ) for key in keys ]
+		table_keys, values = table
+		if not len( table_keys ):
+			return numpy.zeros( len( keys ), dtype=numpy.int64 )
+		found = numpy.searchsorted( table_keys, keys )
+		found[ found == len( table_keys ) ] = 0
+		return numpy.where( table_keys[ found ] == keys, values[ found ], 0 )
+
+	def _id( self, unit ):
+		if unit == BOUNDARY:
+			return self.boundary
+		token_id = self.vocabulary.ids.get( unit, self.unknown )
+		if token_id >= self.boundary:
+			return self.unknown
+		return token_id
+
+	def count( self, ngram ):
+		"""
+		Frequency of an n-gram, a tuple of units with BOUNDARY for a
+		word edge.
+		"""
+		assert 1 <= len( ngram ) <= self.order, "n-grams go from 1 to %d units" % self.order
+		key = self._pack( map( self._id, ngram ) )
+		return int( self._lookup( self.counts[ len( ngram ) ], [ key ] )[ 0 ] )
+
+	def probability( self, ngram ):
+		"""
+		Conditional probability of the last unit of an n-gram given the
+		ones before it, 0 when they are never seen.
+		"""
+		assert 1 <= len( ngram ) <= self.order, "n-grams go from 1 to %d units" % self.order
+		key = self._pack( map( self._id, ngram ) )
+		count = self._lookup( self.counts[ len( ngram ) ], [ key ] )[ 0 ]
+		if len( ngram ) == 1:
+			history = self.total
+		else:
+			history = self._lookup( self.histories[ len( ngram ) ], [ key // self.base ] )[ 0 ]
+		if not history:
+			return 0.0
+		return float( count ) / history
+
+	def ngrams( self, n ):
+		"""
+		Every n-gram of n units.
+		--------------------
+		return - dict { ( unit, ..., unit ) : frequency }
+		"""
+		assert 1 <= n <= self.order, "n-grams go from 1 to %d units" % self.order
+		if self.vectorized:
+			keys, counts = self.counts[ n ]
+			items = zip( keys.tolist(), counts.tolist() )
+		else:
+			items = self.counts[ n ].iteritems()
+		units = self.vocabulary.tokens[ :self.boundary ] + [ BOUNDARY ]
+		ngram_dict = {}
+		for key, frequency in items:
+			ngram = []
+			for ndx in range( n ):
+				key, unit = divmod( key, self.base )
+				ngram.append( units[ unit ] )
+			ngram.reverse()
+			ngram_dict[ tuple( ngram ) ] = frequency
+		return ngram_dict
+
+	def units( self, word ):
+		"""
+		The units of a word: segments without the skipped symbols for a
+		table of symbols, syllables for a table of syllables.
+		"""
+		if self.level == "syllables":
+			return word.split( SYLLABLE )
+		return [ segment for segment in self.lexicon.segmenter.split( word )
+			if segment not in self.skip ]
+
+	def scores( self, words, smoothing=1.0 ):
+		"""
+		Phonotactic probability of every word: the product of the
+		conditional probabilities of its units and of its final edge,
+		each given up to order - 1 units before it, fewer at the start
+		of the word. smoothing is added to every count so an unseen
+		n-gram does not make a word impossible. Vectorized with NumPy.
+		--------------------
+		words - list of words
+		return - list [ log probability, ... ]
+		"""
+		sequences = [ [ self.boundary ] + map( self._id, self.units( word ) ) + [ self.boundary ]
+			for word in words ]
+		if self.vectorized:
+			return self._scores_numpy( sequences, smoothing ).tolist()
+		scores = []
+		for sequence in sequences:
+			score = 0.0
+			for ndx in range( 1, len( sequence ) ):
+				key = self._pack( sequence[ max( 0, ndx - self.order + 1 ):ndx + 1 ] )
+				n = min( ndx + 1, self.order )
+				if n == 1:
+					history = self.total
+				else:
+					history = self.histories[ n ].get( key // self.base, 0 )
+				probability = ( self.counts[ n ].get( key, 0 ) + smoothing ) / \
+					float( history + smoothing * ( self.base - 1 ) or 1 )
+				if probability <= 0:
+					score = float( "-inf" )
+					break
+				score += math.log( probability )
+			scores.append( score )
+		return scores
+
+	def _scores_numpy( self, sequences, smoothing ):
+		lengths = numpy.array( map( len, sequences ), dtype=numpy.intp )
+		sequence = numpy.fromiter( chain.from_iterable( sequences ), dtype=numpy.int64,
+			count=int( lengths.sum() ) )
+		words = numpy.repeat( numpy.arange( len( sequences ) ), lengths )
+		positions = numpy.arange( len( sequence ) ) - numpy.repeat( lengths.cumsum() - lengths, lengths )
+		logs = numpy.zeros( len( sequence ) )
+		longest = self.order - 1
+		# the first units of a word have fewer than order - 1 units
+		# before them, the others are scored by full n-grams at once
+		for history_length in range( min( 1, longest ), longest + 1 ):
+			if history_length < longest:
+				found = ( positions == history_length ).nonzero()[ 0 ]
+			else:
+				found = ( positions >= max( history_length, 1 ) ).nonzero()[ 0 ]
+			keys = numpy.zeros( len( found ), dtype=numpy.int64 )
+			for ndx in range( history_length, -1, -1 ):
+				keys = keys * self.base + sequence[ found - ndx ]
+			n = history_length + 1
+			counts = self._lookup( self.counts[ n ], keys )
+			if n == 1:
+				histories = self.total
+			else:
+				histories = self._lookup( self.histories[ n ], keys // self.base )
+			denominators = histories + smoothing * ( self.base - 1 )
+			probabilities = ( counts + float( smoothing ) ) / numpy.maximum( denominators, 1e-300 )
+			with numpy.errstate( divide="ignore" ):
+				logs[ found ] = numpy.log( probabilities )
+		return numpy.bincount( words, weights=logs, minlength=len( sequences ) )
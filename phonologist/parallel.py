@@ -0,0 +1,107 @@
+# -*- encoding: utf-8 -*-
+from itertools import imap
+from multiprocessing import Pool
+from fmatrixutils import force_unicode
+from phonologist import Words, Syllables, TokenIndex, add_counts
+
+
+class CorpusStatistics( object ):
+	"""
+	Mergeable statistics of one or more transcription files: the
+	TokenIndex tables and the pretonic/postonic/tonic counts of every
+	symbol ( the tonic table ).
+	Files are separate documents, no neighbours are counted across them.
+	"""
+	def __init__( self, tokens=None ):
+		self.index = TokenIndex( () )
+		self.tonic = {}
+		if tokens is not None:
+			self.add( tokens )
+
+	def add( self, tokens ):
+		"""
+		Add the statistics of a Words or Syllables object.
+		"""
+		self.index.merge( tokens.index )
+		if isinstance( tokens, Words ):
+			tonic = tokens.pretonic_postonic_symbols()
+		else:
+			tonic = tokens.pretonic_postonic_syllables()
+		for symbol, counts in tonic.iteritems():
+			add_counts( self.tonic.setdefault( symbol, {} ), counts )
+		return self
+
+	def merge( self, other ):
+		"""
+		Add the statistics of another CorpusStatistics.
+		"""
+		self.index.merge( other.index )
+		for symbol, counts in other.tonic.iteritems():
+			add_counts( self.tonic.setdefault( symbol, {} ), counts )
+		return self
+
+	def count_token( self, target ):
+		target = force_unicode( target )
+		return { target: self.index.counts.get( target, 0 ) }
+
+	def preceding_token( self, target ):
+		return dict( self.index.preceding.get( force_unicode( target ), {} ) )
+
+	def posterior_token( self, target ):
+		return dict( self.index.posterior.get( force_unicode( target ), {} ) )
+
+	def stressed_frequency( self ):
+		return dict( self.index.stressed )
+
+	def unstressed_frequency( self ):
+		return dict( self.index.unstressed )
+
+	def pretonic_postonic( self, target ):
+		"""
+		Same counts as Words.pretonic_postonic_words, over all files.
+		"""
+		counts = self.tonic.get( force_unicode( target ), {} )
+		return { "pretonic": counts.get( "pretonic", 0 ), "postonic": counts.get( "postonic", 0 ) }
+
+
+def file_statistics( job ):
+	"""
+	Worker: statistics of one file.
+	job - ( ipa_textfile, level ) with level "words" or "syllables"
+	"""
+	ipa_textfile, level = job
+	if level == "words":
+		tokens = Words.loadfile( ipa_textfile )
+	else:
+		tokens = Syllables.loadfile( ipa_textfile )
+	return CorpusStatistics( tokens )
+
+def corpus_statistics( ipa_textfiles, level="words", processes=None ):
+	"""
+	Compute the statistics of every file in a pool of processes and
+	merge them into one CorpusStatistics.
+	----------------------
+	ipa_textfiles - list of transcription files
+	level - "words" or "syllables"
+	processes - size of the pool, defaults to the number of cores.
+	1 runs everything in this process.
+	return - CorpusStatistics
+	"""
+	jobs = [ ( ipa_textfile, level ) for ipa_textfile in ipa_textfiles ]
+	statistics = CorpusStatistics()
+	if processes == 1:
+		for partial in imap( file_statistics, jobs ):
+			statistics.merge( partial )
+		return statistics
+	pool = Pool( processes )
+	try:
+		for partial in pool.imap_unordered( file_statistics, jobs ):
+			statistics.merge( partial )
+	except:
+		pool.terminate()
+		raise
+	else:
+		pool.close()
+	finally:
+		pool.join()
+	return statistics
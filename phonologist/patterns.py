@@ -0,0 +1,286 @@
+# -*- encoding: utf-8 -*-
+"""
+Patterns over segments, compiled together into one automaton that
+counts every pattern of a batch in a single pass over a transcription.
+
+A pattern is a sequence of elements, separated by whitespace or not:
+
+	p, t͡ʃ, ka		literal symbols
+	NASALS, C, V	the groups of constants, C and V for CONSONANTS and VOWELLS,
+				CVC is C V C. Any other capitals are a ValueError
+	[+nasal -son]	the symbols with every feature of the bundle
+	_				any symbol
+	. ˈ #			syllable boundry, stress mark, word edge
+
+	>>> Symbols.loadfile( "speaker.txt" ).count_patterns( [ u"[+nasal] . C", u"# ˈ V" ] )
+
+Syllable boundries and stress marks are passed over by the elements
+that do not ask for them, so "n t" matches "n.t" and "ˈnt" too, but a
+pattern only spans a word edge when it spells #. Word edges are known
+for transcriptions loaded from words, the start and end of the whole
+transcription always count as one.
+"""
+import re
+import constants
+from constants import STRESS, SYLLABLE, CONSONANTS, VOWELLS
+from fmatrixutils import MARKS
+from segments import SEGMENTER
+from instrument import count_scan
+
+# ids of the boundries in the stream of segments, never symbol ids
+SYLLABLE_EDGE = -1
+WORD_EDGE = -2
+WORD = u"#"
+ANY = u"_"
+GROUPS = dict( [ ( name, frozenset( getattr( constants, name ) ) ) for name in
+	( "CONSONANTS", "VOWELLS", "GLIDES", "VOWELLS_GLIDES", "LIQUIDS", "NASALS",
+	"NASALS_LIQUIDS", "AFFRICATES", "LARYNGEALS", "NONCORONAL_OBSTRUENTS",
+	"PALATAL_OBSTRUENTS", "CORONAL_OBSTRUENTS" ) ] )
+GROUPS[ "C" ] = frozenset( CONSONANTS )
+GROUPS[ "V" ] = frozenset( VOWELLS )
+_ELEMENTS = re.compile( u"\[[^\]]*\]|[^\s\[]+", re.UNICODE )
+# group names in a chunk, the rest is segments
+_NAMES = re.compile( u"([A-Z]+(?:_[A-Z]+)*)", re.UNICODE )
+_FEATURE = re.compile( u"([+-])(\S+)$", re.UNICODE )
+
+
+def parse( pattern, fmatrix, segmenter=SEGMENTER ):
+	"""
+	Split a pattern into its elements. Capitals must spell a group
+	name or a run of C and V, ValueError otherwise.
+	--------------------
+	return - list [ element, ... ], each a function telling whether
+	a symbol matches, or SYLLABLE_EDGE / WORD_EDGE
+	"""
+	elements = []
+	for chunk in _ELEMENTS.findall( pattern ):
+		if chunk.startswith( u"[" ):
+			plus, minus = [], []
+			for feature in chunk[ 1:-1 ].split():
+				match = _FEATURE.match( feature )
+				assert match and match.group( 2 ) in fmatrix.features, \
+					"unknown feature %s in %s" % ( feature, pattern )
+				( plus if match.group( 1 ) == u"+" else minus ).append( match.group( 2 ) )
+			elements.append( _in_class( fmatrix, plus, minus ) )
+		else:
+			for ndx, part in enumerate( _NAMES.split( chunk ) ):
+				if ndx % 2:
+					elements.extend( _groups( part, pattern ) )
+				else:
+					elements.extend( _segments( part, segmenter ) )
+	assert elements, "empty pattern %r" % pattern
+	return elements
+
+def _groups( name, pattern ):
+	"""
+	The elements of a group name, or of a run of C and V.
+	"""
+	if name in GROUPS:
+		return [ GROUPS[ name ].__contains__ ]
+	if name.strip( u"CV" ):
+		raise ValueError( "unknown group %s in %s" % ( name, pattern ) )
+	return [ GROUPS[ letter ].__contains__ for letter in name ]
+
+def _segments( text, segmenter ):
+	elements = []
+	for segment in segmenter.segments( text ):
+		if segment == SYLLABLE:
+			elements.append( SYLLABLE_EDGE )
+		elif segment == WORD:
+			elements.append( WORD_EDGE )
+		elif segment == ANY:
+			elements.append( _any_segment )
+		else:
+			elements.append( segment.__eq__ )
+	return elements
+
+def _any_segment( symbol ):
+	return symbol not in MARKS
+
+def _in_class( fmatrix, plus, minus ):
+	members = fmatrix.natural_class( plus, minus )
+	def in_class( symbol ):
+		if symbol in members:
+			return True
+		if symbol in MARKS:
+			return False
+		ndx = fmatrix.row( symbol )
+		return ndx != fmatrix.no_features and fmatrix.symbols[ ndx ] in members
+	return in_class
+
+
+class PatternSet( object ):
+	"""
+	A batch of patterns compiled into one deterministic automaton over
+	the ids of a symbol vocabulary. The states are sets of ( pattern,
+	element ) positions, built the first time a transition is taken, so
+	a pass costs one table lookup per segment however many patterns
+	there are. Symbols interned after compiling are matched as they come.
+	"""
+	def __init__( self, patterns, vocabulary, fmatrix, segmenter=SEGMENTER ):
+		self.patterns = list( patterns )
+		self.vocabulary = vocabulary
+		self.elements = [ parse( pattern, fmatrix, segmenter ) for pattern in self.patterns ]
+		self._stress = vocabulary.ids.get( STRESS )
+		# ( pattern, element ) positions of every token, see _positions
+		self._matching = {}
+		# the states, their transitions and the patterns they complete
+		start = frozenset( [ ( ndx, 0 ) for ndx in range( len( self.patterns ) ) ] )
+		self._states = { ( start, () ): 0 }
+		self._sets = [ start ]
+		self._table = [ {} ]
+		self._accepting = [ () ]
+
+	def _positions( self, token ):
+		"""
+		The ( pattern, element ) positions whose element matches token.
+		"""
+		try:
+			return self._matching[ token ]
+		except KeyError:
+			pass
+		if token < 0:
+			symbol = None
+			if token == SYLLABLE_EDGE:
+				kinds = ( SYLLABLE_EDGE, )
+			else:
+				kinds = ( SYLLABLE_EDGE, WORD_EDGE )
+		else:
+			symbol = self.vocabulary.tokens[ token ]
+			if symbol == STRESS:
+				self._stress = token
+		positions = set()
+		for ndx, elements in enumerate( self.elements ):
+			for position, element in enumerate( elements ):
+				if symbol is None:
+					if element in kinds:
+						positions.add( ( ndx, position ) )
+				elif element not in ( SYLLABLE_EDGE, WORD_EDGE ) and element( symbol ):
+					positions.add( ( ndx, position ) )
+		positions = self._matching[ token ] = frozenset( positions )
+		return positions
+
+	def _step( self, state, token ):
+		"""
+		Build the transition of state on token.
+		"""
+		positions = self._positions( token )
+		# syllable boundries and stress marks are passed over
+		skipped = token == SYLLABLE_EDGE or ( token >= 0 and token == self._stress )
+		following = set( [ ( ndx, 0 ) for ndx in range( len( self.patterns ) ) ] )
+		accepting = []
+		for ndx, position in self._sets[ state ]:
+			if ( ndx, position ) in positions:
+				if position + 1 == len( self.elements[ ndx ] ):
+					accepting.append( ndx )
+				else:
+					following.add( ( ndx, position + 1 ) )
+			if skipped and position > 0:
+				following.add( ( ndx, position ) )
+		following = frozenset( following )
+		# the patterns completed by the transition go to the state it
+		# leads to, so a state is kept for every set of completions
+		key = ( following, tuple( accepting ) )
+		try:
+			target = self._states[ key ]
+		except KeyError:
+			target = self._states[ key ] = len( self._sets )
+			self._sets.append( following )
+			self._table.append( {} )
+			self._accepting.append( tuple( accepting ) )
+		self._table[ state ][ token ] = target
+		return target
+
+	def _edges( self, tokens ):
+		"""
+		The boundry before every symbol of a symbols TokenArray, and
+		after the last one: 0 for none, 1 for a syllable boundry and
+		2 for a word edge.
+		"""
+		edges = bytearray( len( tokens.ids ) + 1 )
+		for offsets, edge in ( ( tokens.syllable_offsets, 1 ), ( tokens.word_offsets, 2 ) ):
+			if offsets is not None:
+				for offset in offsets:
+					edges[ offset ] = edge
+		edges[ 0 ] = edges[ -1 ] = 2
+		return edges
+
+	def _run( self, tokens, ends=None ):
+		"""
+		Count the matches of every pattern in one pass over tokens, the
+		boundries in between symbols taken from the offsets. Syllable
+		marks left in the symbols are boundries too.
+		--------------------
+		ends - list with a list per pattern to get the index of the
+		symbol after every match, None to only count
+		return - list [ frequency, ... ] indexed by pattern
+		"""
+		assert tokens.vocabulary is self.vocabulary, "the patterns were compiled for another lexicon"
+		ids = tokens.ids
+		count_scan( len( ids ) )
+		edges = self._edges( tokens )
+		kinds = ( None, SYLLABLE_EDGE, WORD_EDGE )
+		syllable = self.vocabulary.ids.get( SYLLABLE )
+		table = self._table
+		accepting = self._accepting
+		# visits of the accepting states
+		hits = {}
+		state = 0
+		ndx = 0
+		for token in ids:
+			if edges[ ndx ]:
+				edge = kinds[ edges[ ndx ] ]
+				try:
+					state = table[ state ][ edge ]
+				except KeyError:
+					state = self._step( state, edge )
+				if accepting[ state ]:
+					hits[ state ] = hits.get( state, 0 ) + 1
+					if ends is not None:
+						self._accept( accepting[ state ], ndx, ends )
+			if token == syllable:
+				token = SYLLABLE_EDGE
+			try:
+				state = table[ state ][ token ]
+			except KeyError:
+				state = self._step( state, token )
+			ndx += 1
+			if accepting[ state ]:
+				hits[ state ] = hits.get( state, 0 ) + 1
+				if ends is not None:
+					self._accept( accepting[ state ], ndx if token >= 0 else ndx - 1, ends )
+		state = self._step( state, WORD_EDGE )
+		hits[ state ] = hits.get( state, 0 ) + 1
+		if ends is not None:
+			self._accept( accepting[ state ], ndx, ends )
+		counts = [ 0 ] * len( self.patterns )
+		for state, frequency in hits.iteritems():
+			for pattern in accepting[ state ]:
+				counts[ pattern ] += frequency
+		return counts
+
+	def _accept( self, patterns, end, ends ):
+		for pattern in patterns:
+			ends[ pattern ].append( end )
+
+	def count( self, tokens ):
+		"""
+		Count the matches of every pattern in one pass, overlapping
+		matches included.
+		--------------------
+		tokens - symbols TokenArray
+		return - dict { pattern : frequency }
+		"""
+		return dict( zip( self.patterns, self._run( tokens ) ) )
+
+	def find( self, tokens ):
+		"""
+		Where every pattern matches, in one pass.
+		--------------------
+		tokens - symbols TokenArray
+		return - dict { pattern : [ end, ... ] }, end the index in tokens
+		of the symbol after the match
+		"""
+		ends = [ [] for pattern in self.patterns ]
+		self._run( tokens, ends )
+		return dict( zip( self.patterns, ends ) )
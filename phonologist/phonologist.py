@@ -1,10 +1,19 @@
 # -*- encoding: utf-8 -*-
 
-import codecs
 import re
-from fmatrixutils import find_pos, find_neg
+from itertools import chain, imap
+from corpus import TokenArray, CONSTITUENTS
+from context import context_counts
+from minimalpairs import NeighbourhoodIndex
+from patterns import PatternSet
+from ngrams import NgramTable
+from instrument import count_scan, count_cache
+from fmatrixutils import numpy, FEATURE_MATRIX
+from fileutils import ENCODING, PROFILE, iter_words, normalizer
+from segments import SEGMENTER
+from cache import file_key, cache_path, read_compiled, write_compiled, load_statistic
 from constants import  ( IPA_SYMBOLS, STRESS, VOWELLS, CONSONANTS, PERIOD, COMMA, SYLLABLE, 
-							FMATRIX, GLIDES, VOWELLS_GLIDES, LIQUIDS, NASALS, NASALS_LIQUIDS,
+							GLIDES, VOWELLS_GLIDES, LIQUIDS, NASALS, NASALS_LIQUIDS,
 							AFFRICATES, LARYNGEALS, NONCORONAL_OBSTRUENTS, PALATAL_OBSTRUENTS,
 							CORONAL_OBSTRUENTS, DISTINCTIVE_FEATURES, FEATURE_GROUPS )
 
@@ -13,6 +22,49 @@ class BasePhonologist( object ):
 	"""
 	Base class with magic methods for all other classes.
 	"""
+	# level of the tokens, as in TokenArray.level
+	_level = "words"
+
+	@classmethod
+	def loadfile( cls, ipa_textfile, encoding=ENCODING, cache=None, profile=PROFILE ):
+		"""
+		Read every line of a Perkins transcription file, streaming
+		the tokens straight into a new object of this class.
+		profile - how the text is normalized while it is read: a name of
+		fileutils.PROFILES, a fileutils.Normalizer, or None to read it
+		as it is. By default Perkins output is turned into standard IPA.
+		cache - True to keep a compiled copy of the corpus next to the
+		file, or a directory to keep it in. Later loads of the same
+		file content map the compiled copy instead of parsing the text.
+		"""
+		if not cache:
+			return cls._parse( ipa_textfile, encoding, profile )
+		key = file_key( ipa_textfile, cls._level, encoding, normalizer( profile ) )
+		path = cache_path( ipa_textfile, cls._level, key, cache )
+		compiled = read_compiled( path, key )
+		count_cache( "compiled", compiled is not None )
+		if compiled is not None:
+			phon_trans = cls.__new__( cls )
+			phon_trans.tokens, phon_trans._compiled = compiled
+			return phon_trans
+		phon_trans = cls._parse( ipa_textfile, encoding, profile )
+		statistics = { "id_counts": phon_trans.id_counts }
+		if hasattr( cls, "index" ):
+			statistics[ "index" ] = phon_trans.index.__dict__
+		write_compiled( path, key, phon_trans.tokens, statistics )
+		return phon_trans
+
+	@classmethod
+	def _parse( cls, ipa_textfile, encoding, profile ):
+		"""
+		Stream the words of a file. Lower levels split the word ids, so
+		each word type is only broken into syllables and symbols once.
+		"""
+		words = iter_words( ipa_textfile, encoding, profile=profile )
+		if cls._level == "words":
+			return cls( words )
+		return cls( Words( words ) )
+
 	def __init__( self, tokens ):
 		self.tokens = InputManager(tokens).words()		
 
@@ -20,7 +72,7 @@ class BasePhonologist( object ):
 		return len(self.tokens)
 
 	def __iter__( self ):
-		return TokenIterator( self.tokens )
+		return iter( self.tokens )
 
 	def __getitem__( self, ndx ):
 		assert ndx >= 0 and ndx < len( self.tokens ), "index out of range"
@@ -28,7 +80,79 @@ class BasePhonologist( object ):
 
 	def __setitem__( self, ndx, token ):
 		assert ndx >= 0 and ndx < len( self.tokens ), "index out of range"
+		self._compiled = None
+		self._neighbourhood = None
+		old_id = self.tokens.ids[ ndx ]
+		old = self.tokens[ ndx ]
 		self.tokens[ ndx ] = token
+		if self._id_counts is not None:
+			self._count_ids( [ old_id ], -1 )
+			self._count_ids( [ self.tokens.ids[ ndx ] ], 1 )
+		if self._index is not None:
+			previous = following = None
+			if ndx > 0:
+				previous = self.tokens[ ndx - 1 ]
+			if ndx < len( self.tokens ) - 1:
+				following = self.tokens[ ndx + 1 ]
+			self._index.replace( old, self.tokens[ ndx ], previous, following )
+
+	_index = None
+	_id_counts = None
+	# the minimal pair index of Words, dropped when the tokens change
+	_neighbourhood = None
+	# marshalled statistics of a compiled corpus, see loadfile
+	_compiled = None
+
+	def append( self, token ):
+		"""
+		Add one token at the end.
+		"""
+		self.extend( [ token ] )
+
+	def extend( self, tokens ):
+		"""
+		Add tokens at the end, in any format the constructor takes.
+		Statistics already built are updated for the new tokens only.
+		Word and syllable boundries are kept, see TokenArray.extend.
+		"""
+		added = getattr( InputManager( tokens ), self.tokens.level )()
+		new_tokens = list( added )
+		self._compiled = None
+		self._neighbourhood = None
+		if len( self.tokens ):
+			previous = self.tokens[ -1 ]
+		else:
+			previous = None
+		start = len( self.tokens )
+		self.tokens.extend( new_tokens, added.syllable_offsets, added.word_offsets )
+		if self._id_counts is not None:
+			self._count_ids( self.tokens.ids[ start: ], 1 )
+		if self._index is not None:
+			self._index.extend( new_tokens, previous )
+
+	@property
+	def id_counts( self ):
+		"""
+		Frequency of the ids of the tokens. Built once, on first use.
+		---------------------
+		return - dict { id : frequency }
+		"""
+		count_cache( "id_counts", self._id_counts is not None )
+		if self._id_counts is None and self._compiled:
+			self._id_counts = load_statistic( self._compiled[ "id_counts" ] )
+		if self._id_counts is None:
+			self._id_counts = dict( [ ( token_id, int( frequency ) ) for token_id, frequency
+				in enumerate( self.tokens.counts() ) if frequency ] )
+		return self._id_counts
+
+	def _count_ids( self, ids, delta ):
+		id_counts = self._id_counts
+		for token_id in ids:
+			frequency = id_counts.get( token_id, 0 ) + delta
+			if frequency:
+				id_counts[ token_id ] = frequency
+			else:
+				del id_counts[ token_id ]
 
 
 ######################################################
@@ -39,6 +163,19 @@ class BaseTokens( BasePhonologist ):
 	Syllables objects should be divided at syllable boundries.
 	"""
 
+	@property
+	def index( self ):
+		"""
+		Frequency and neighbour index of the tokens. Built once, on first use.
+		"""
+		count_cache( "index", self._index is not None )
+		if self._index is None and self._compiled:
+			self._index = TokenIndex.__new__( TokenIndex )
+			self._index.__dict__.update( load_statistic( self._compiled[ "index" ] ) )
+		if self._index is None:
+			self._index = TokenIndex( self.tokens )
+		return self._index
+
 	def count_token( self, target ):
 		"""
 		Count the frequency of target token.
@@ -47,11 +184,7 @@ class BaseTokens( BasePhonologist ):
 		return - dict { token : frequency }
 		"""
 		target = InputManager( target ).force_unicode()
-		token_dict = { target: 0 }
-		for token in self.tokens:
-			if token == target:
-				token_dict[ target ] += 1
-		return token_dict
+		return { target: self.index.counts.get( target, 0 ) }
 
 	def preceding_token( self, target ):
 		"""
@@ -61,12 +194,7 @@ class BaseTokens( BasePhonologist ):
 		return - dict { target token : frequency }
 		"""
 		target = InputManager(target).force_unicode()
-		token_dict = {}
-		for ndx, token in enumerate(self.tokens[ 1: ]):
-			if token == target:
-				token_dict.setdefault( self.tokens[ ndx ], 0 )
-				token_dict[ self.tokens[ ndx ] ] += 1
-		return token_dict 
+		return dict( self.index.preceding.get( target, {} ) )
 
 	def posterior_token( self, target ):
 		"""
@@ -76,14 +204,7 @@ class BaseTokens( BasePhonologist ):
 		return - dict { posterior token : frequency }
 		"""
 		target = InputManager(target).force_unicode()
-		token_dict = {}
-		ndx = 0
-		for i in range( len( self.tokens ) - 1 ):
-			if self.tokens[ndx] == target:
-				token_dict.setdefault( self.tokens[ ndx + 1], 0 )
-				token_dict[ self.tokens[ndx + 1] ] += 1
-			ndx += 1
-		return token_dict
+		return dict( self.index.posterior.get( target, {} ) )
 
 	def stressed_frequency( self ):
 		"""
@@ -91,12 +212,7 @@ class BaseTokens( BasePhonologist ):
 		---------------------
 		return - dict { word with primary stress : frequency }
 		"""
-		stress_dict = {}
-		for token in self.tokens:
-			if STRESS in token:
-				stress_dict.setdefault( token, 0 )
-				stress_dict[ token ] += 1
-		return stress_dict
+		return dict( self.index.stressed )
 
 	def unstressed_frequency( self ):
 		"""
@@ -104,12 +220,7 @@ class BaseTokens( BasePhonologist ):
 		---------------------
 		return - dict { word without primary stress : frequency }
 		"""
-		stress_dict = {}
-		for token in self.tokens:
-			if STRESS not in token:
-				stress_dict.setdefault( token, 0 )
-				stress_dict[ token ] += 1
-		return stress_dict
+		return dict( self.index.unstressed )
 
 	def token_by_symbol( self, target ):
 		"""
@@ -118,13 +229,7 @@ class BaseTokens( BasePhonologist ):
 		target - ipa symbol
 		return - dict { token with symbol : frequency }
 		"""
-		target = InputManager( target ).force_unicode()
-		token_dict = {}
-		for token in self.tokens:
-			if target in token:
-				token_dict.setdefault( token, 0 )
-				token_dict[ token ] += 1
-		return token_dict
+		return self.token_by_symbols( [ target ] )
 	
 	def stressed_token_by_symbol( self, target ):
 		"""
@@ -133,14 +238,7 @@ class BaseTokens( BasePhonologist ):
 		target - ipa symbol
 		return - dict { stressed token with symbol : frequency }
 		"""
-		target = InputManager( target ).force_unicode()
-		tokens = self.token_by_symbol( target )
-		token_dict = {}
-		for token in tokens.keys():
-			if STRESS in token:
-				token_dict.setdefault(token,0)
-				token_dict[ token ] += tokens[token]
-		return token_dict
+		return self.token_by_symbols( [ target ], stressed=True )
 
 	def unstressed_token_by_symbol( self, target ):
 		"""
@@ -149,13 +247,23 @@ class BaseTokens( BasePhonologist ):
 		target - ipa symbol
 		return - dict { unstressed token with symbol : frequency }
 		"""
-		target = InputManager( target ).force_unicode()
-		tokens = self.token_by_symbol( target )
+		return self.token_by_symbols( [ target ], stressed=False )
+
+	def token_by_symbols( self, targets, stressed=None ):
+		"""
+		Count the frequency of all tokens containing every one of
+		a list of symbols, e.g. [ u"ɲ", u"a" ].
+		---------------------
+		targets - list of ipa symbols
+		stressed - True for stressed tokens only, False for unstressed
+		tokens only, None for both
+		return - dict { token with symbols : frequency }
+		"""
+		targets = [ InputManager( target ).force_unicode() for target in targets ]
+		counts = self.index.counts
 		token_dict = {}
-		for token in tokens.keys():
-			if STRESS not in token:
-				token_dict.setdefault(token,0)
-				token_dict[ token ] += tokens[token]
+		for token in self.index.find( targets, stressed ):
+			token_dict[ token ] = counts[ token ]
 		return token_dict
 
 	def syllabify( self ):
@@ -164,10 +272,27 @@ class BaseTokens( BasePhonologist ):
 		--------------------
 		return - list [ syll, ..., syll ]
 		"""
-		syllables = []
-		for token in self.tokens:
-			syllables.append(token.split("."))
-		return sum(syllables,[]) # hehe good trick
+		return list( self.iter_syllables() )
+
+	def iter_syllables( self ):
+		"""
+		Lazily break a "Words" format object into syllables, one at
+		a time. Each word type is only split once.
+		--------------------
+		return - generator ( syll, ..., syll )
+		"""
+		count_scan( len( self.tokens ) )
+		if self.tokens.level == "words":
+			lexicon = self.tokens.lexicon
+			splits = lexicon.splits( "words" )
+			syllables = lexicon.syllables.tokens
+			for token_id in self.tokens.ids:
+				for syllable_id in splits[ token_id ]:
+					yield syllables[ syllable_id ]
+		else:
+			for token in self.tokens:
+				for syllable in token.split( SYLLABLE ):
+					yield syllable
 
 	def _stressed( self, token ):
 		"""
@@ -194,17 +319,8 @@ class Words( BaseTokens ):
 	Class for working with tokens divided at word boundries
 	"""
 
-	@classmethod
-	def loadfile( Words, ipa_textfile ):
-		"""
-		Try to read the input textfile to proper format for words.
-		"""
-		f = codecs.open( ipa_textfile, "r", encoding='utf-8' )
-		text = f.readline()
-		words = text.split()
-		f.close()
-		return Words(words)
-	
+	fmatrix = FEATURE_MATRIX
+
 	def pretonic_postonic_words( self, target ):
 		"""
 		Currently just counts the occurence of a symbol in a pretonic
@@ -214,31 +330,154 @@ class Words( BaseTokens ):
 		return dict { pretonic : frequency, postonic : frequency }
 		"""
 		target = InputManager(target).force_unicode()
-		count_dict = { "pretonic":0, "postonic":0 }
-		for token in self.tokens:
-			if target in token:
-				token_dict = self._pretonic_postonic( target, token )
-				count_dict[ "pretonic" ] += token_dict[ "pretonic" ]
-				count_dict[ "postonic" ] += token_dict[ "postonic" ]
-					
+		symbol_dict = self.pretonic_postonic_symbols( [ target ] ).get( target, {} )
+		return { "pretonic": symbol_dict.get( "pretonic", 0 ),
+			"postonic": symbol_dict.get( "postonic", 0 ) }
+
+	def pretonic_postonic_symbols( self, targets=None ):
+		"""
+		Count the occurences of every symbol in a pretonic, postonic or
+		tonic ( stressed ) syllable in one pass over the word types,
+		taking into account word boundries. A syllable counts once
+		per symbol it contains, see syllable_types.
+		----------------------
+		targets - list of ipa symbols, None for all symbols
+		return dict { symbol : { pretonic : frequency, postonic : frequency,
+		tonic : frequency } }
+		"""
+		lexicon = self.tokens.lexicon
+		splits = lexicon.splits( "words" )
+		syllables = syllable_types( lexicon, targets )
+		count_dict = {}
+		for token_id, frequency in self.id_counts.iteritems():
+			count_tonic( count_dict, splits[ token_id ], syllables, frequency )
+		return count_dict
+
+	def word_types( self ):
+		"""
+		The parsed structure of every word type in the corpus, see
+		corpus.WordType. Each type is parsed once for the lexicon.
+		----------------------
+		return - list [ ( WordType, frequency ), ... ]
+		"""
+		word_types = self.tokens.lexicon.word_types()
+		return [ ( word_types[ token_id ], frequency )
+			for token_id, frequency in self.id_counts.iteritems() ]
+
+	def constituent_frequency( self, constituent, stressed=None ):
+		"""
+		Count the symbols in one constituent of every syllable.
+		----------------------
+		constituent - "onset", "nucleus" or "coda"
+		stressed - True / False to count only stressed / unstressed
+		syllables, None for all
+		return dict { symbol : frequency }
+		"""
+		spans_name = CONSTITUENTS[ constituent ]
+		symbols = self.tokens.lexicon.symbols.tokens
+		count_dict = {}
+		for word_type, frequency in self.word_types():
+			for ndx, ( start, end ) in enumerate( getattr( word_type, spans_name ) ):
+				if stressed is not None and ( ndx == word_type.stressed ) != stressed:
+					continue
+				for symbol_id in word_type.symbols[ start:end ]:
+					symbol = symbols[ symbol_id ]
+					count_dict[ symbol ] = count_dict.get( symbol, 0 ) + frequency
+		return count_dict
+
+	def stress_positions( self ):
+		"""
+		Count where words are stressed, counting syllables from the end
+		of the word: 1 for final stress, 2 for penultimate and so on.
+		----------------------
+		return dict { position : frequency }, position None for words
+		without stress
+		"""
+		count_dict = {}
+		for word_type, frequency in self.word_types():
+			position = None
+			if word_type.stressed is not None:
+				position = len( word_type ) - word_type.stressed
+			count_dict[ position ] = count_dict.get( position, 0 ) + frequency
 		return count_dict
 	
-	def _pretonic_postonic( self, target, token ):
-		"""
-		Counts pretonic postonic per word.
-		"""
-		count_dict = { "pretonic":0, "postonic":0 }
-		stoken = token.split( "." )
-		if len( stoken ) > 1:
-			for ndx, syll in enumerate( stoken ):
-				if target in syll and not self._stressed( syll ):
-					if ndx > 0 and STRESS in stoken[ ndx-1 ]:
-						count_dict[ "pretonic" ] += 1
-					if ndx < len( stoken ) - 1 and STRESS in stoken[ ndx+1 ]:
-						count_dict[ "postonic" ] += 1			
-			return count_dict
+	def neighbourhood( self ):
+		"""
+		Index of the word types by their one segment wildcard variants,
+		built in one pass over the types. Built once, on first use, and
+		shared by the minimal pair and neighbour queries until the words
+		change.
+		----------------------
+		return - minimalpairs.NeighbourhoodIndex
+		"""
+		count_cache( "neighbourhood", self._neighbourhood is not None )
+		if self._neighbourhood is None:
+			self._neighbourhood = NeighbourhoodIndex( self.tokens.lexicon, self.id_counts )
+		return self._neighbourhood
+
+	def minimal_pairs( self, position=None, group=None, plus=None, minus=None ):
+		"""
+		Find the pairs of word types that differ in exactly one segment,
+		stress marks apart: ˈka.sa and ˈka.ta but not ˈka.sa and ka.ˈsa.
+		----------------------
+		position - "onset", "nucleus", "coda", "stressed" or "unstressed",
+		where the contrasting segments must be, None for anywhere
+		group - only contrasts between symbols in this group, e.g. NASALS
+		plus, minus - only contrasts between symbols with these features
+		return - list [ ( word, word, symbol, symbol ), ... ]
+		"""
+		# built first, the symbols of the lexicon are interned with it
+		neighbourhood = self.neighbourhood()
+		contrasts = None
+		if group is not None:
+			contrasts = set( group )
+		if plus or minus:
+			natural_class = self.fmatrix.find_class( self.tokens.lexicon.symbols.tokens,
+				plus or [], minus or [] )
+			if contrasts is None:
+				contrasts = natural_class
+			else:
+				contrasts &= natural_class
+		return neighbourhood.pairs( position, contrasts )
+
+	def neighbours( self, target ):
+		"""
+		Find the word types one segment away from target, which need
+		not be in the corpus.
+		----------------------
+		target - word, stress and syllable marks are ignored
+		return - dict { word : ( symbol, symbol ) }, the segment of
+		target and the one of word that differ
+		"""
+		target = InputManager( target ).force_unicode()
+		target = target.replace( STRESS, u"" ).replace( SYLLABLE, u"" )
+		return self.neighbourhood().neighbours( self.tokens.lexicon.segmenter.split( target ) )
+
+	def phonotactic_scores( self, targets=None, order=2, smoothing=1.0 ):
+		"""
+		Score words by the n-grams of symbols of the corpus and by their
+		neighbourhood: the log phonotactic probability ( see
+		ngrams.NgramTable.scores ), the number of word types one segment
+		away ( see neighbours ) and the frequency of those types.
+		----------------------
+		targets - list of words, None for every word type of the corpus
+		return dict { word : { probability : float, neighbours : count,
+		frequency : frequency } }
+		"""
+		lexicon = self.tokens.lexicon
+		if targets is None:
+			targets = [ lexicon.words[ token_id ] for token_id in self.id_counts ]
 		else:
-			return count_dict
+			targets = [ InputManager( target ).force_unicode() for target in targets ]
+		table = NgramTable( self.tokens.split().split(), order, ( STRESS, SYLLABLE ) )
+		index = self.neighbourhood()
+		scores = {}
+		for target, probability in zip( targets, table.scores( targets, smoothing ) ):
+			neighbours = index.neighbours( table.units( target ) )
+			scores[ target ] = { "probability": probability, "neighbours": len( neighbours ),
+				"frequency": sum( [ self.id_counts[ lexicon.words.ids[ word ] ]
+					for word in neighbours ] ) }
+		return scores
 
 ###################################################
 class Syllables( BaseTokens ):
@@ -246,25 +485,74 @@ class Syllables( BaseTokens ):
 	Class for working with tokens divided at syllable boundries.
 	"""
 
-	@classmethod
-	def loadfile( Syllables, ipa_textfile ):
-		"""
-		Try to read textfile input to proper format for syllables.
-		"""
-		f = codecs.open( ipa_textfile, "r", encoding='utf-8')
-		text = f.readline()
-		tokens = text.split()
-		syllable_list = []
-		for word in tokens:
-			syllable_list.append(word.split("."))
-		syllables = sum(syllable_list,[])
-		return Syllables(syllables)
+	_level = "syllables"
+	# the FeatureMatrix of the feature bundles in patterns
+	fmatrix = FEATURE_MATRIX
 
 	def __init__( self, tokens ):
 		self.tokens = InputManager(tokens).syllables()
 
-	def pretonic_postonic_syllables(self):
-		pass
+	def count_patterns( self, patterns ):
+		"""
+		Count the matches of a batch of patterns in one pass over the
+		segments of the syllables, see patterns.PatternSet. Syllable
+		boundries are always known, word edges when the syllables
+		come from words.
+		----------------------
+		patterns - list of patterns, e.g. [ u"[+nasal] . C", u"ˈ C V #" ]
+		return dict { pattern : frequency }
+		"""
+		return self.compile_patterns( patterns ).count( self.tokens.split() )
+
+	def find_pattern( self, pattern ):
+		"""
+		Where a pattern matches in the segments of the syllables.
+		----------------------
+		return list [ end, ... ], the index of the symbol after each
+		match in Symbols( syllables )
+		"""
+		return self.compile_patterns( [ pattern ] ).find( self.tokens.split() )[ pattern ]
+
+	def ngrams( self, order=2 ):
+		"""
+		Count the n-grams of syllables for n = 1 to order, word edges
+		included when known, see ngrams.NgramTable.
+		----------------------
+		return - ngrams.NgramTable
+		"""
+		return NgramTable( self.tokens, order )
+
+	def compile_patterns( self, patterns ):
+		"""
+		Compile patterns once to count them in many passes.
+		----------------------
+		return - patterns.PatternSet
+		"""
+		return PatternSet( patterns, self.tokens.lexicon.symbols, self.fmatrix,
+			self.tokens.lexicon.segmenter )
+
+	def pretonic_postonic_syllables( self, targets=None ):
+		"""
+		Count the occurences of every symbol in a pretonic, postonic or
+		tonic ( stressed ) syllable in one pass over the syllables. Word
+		boundries are taken into account when the syllables come from
+		a Words object, otherwise the syllables are one sequence. A
+		syllable counts once per symbol it contains, see syllable_types.
+		----------------------
+		targets - list of ipa symbols, None for all symbols
+		return dict { symbol : { pretonic : frequency, postonic : frequency,
+		tonic : frequency } }
+		"""
+		syllables = syllable_types( self.tokens.lexicon, targets )
+		ids = self.tokens.ids
+		count_scan( len( ids ) )
+		offsets = self.tokens.word_offsets
+		if offsets is None:
+			offsets = [ 0, len( ids ) ]
+		count_dict = {}
+		for ndx in range( len( offsets ) - 1 ):
+			count_tonic( count_dict, ids[ offsets[ ndx ]:offsets[ ndx + 1 ] ], syllables )
+		return count_dict
 
 	#### SYLLABLE NUCLEUS AND EVERYTHING HERE i.e. More Methods Coming
 
@@ -279,22 +567,25 @@ class Symbols( BasePhonologist ):
 	# This is a list of groups that can be passed through various methods.
 	# Need to change the format for clean passing... 
 	feature_groups = FEATURE_GROUPS
+	# the FeatureMatrix natural classes are found in, assign a matrix
+	# from fmatrixutils.load_fmatrix to work with another inventory
+	fmatrix = FEATURE_MATRIX
+
+	_level = "symbols"
 
-	@classmethod
-	def loadfile( Symbols, ipa_textfile ):
-		"""
-		Try to read textfile to proper format for Symbols.
-		"""
-		f = codecs.open( ipa_textfile, "r", encoding='utf-8')
-		text = f.readline()
-		joined_text = re.sub( '\s', '', text )
-		syllables = joined_text.split( "." )
-		symbols = ''.join( syllables )
-		return Symbols( symbols )
-		
 	def __init__( self, tokens ):
 		self.tokens = InputManager( tokens ).symbols()
 
+	@property
+	def inventory( self ):
+		"""
+		The distinct symbols of the transcription.
+		---------------------
+		return - set ([ sym, ..., sym ])
+		"""
+		symbols = self.tokens.vocabulary.tokens
+		return set([ symbols[ ndx ] for ndx in self.id_counts ])
+
 	def count_symbol( self, target ):
 		"""
 		Count the frequency of a particular symbol.
@@ -304,6 +595,76 @@ class Symbols( BasePhonologist ):
 		"""
 		pass
 
+	def context( self, targets=None, side="preceding", k=1, skip=( STRESS, ),
+				group=None, plus=None, minus=None ):
+		"""
+		Count the k nearest symbols preceding or posterior to every
+		target in one pass over the transcription.
+		---------------------
+		targets - list of ipa symbols, None for all symbols
+		side - "preceding" or "posterior"
+		k - size of the context window
+		skip - symbols passed over when looking for neighbours ( stress,
+		boundry marks )
+		group - only count contexts of symbols in this group, e.g. CONSONANTS
+		plus, minus - only count contexts of symbols with these features
+		return - dict { target : { symbol : frequency } }, or
+		{ target : { ( symbol, ..., symbol ) : frequency } } when k > 1
+		"""
+		if targets is not None:
+			targets = [ InputManager( target ).force_unicode() for target in targets ]
+		neighbours = None
+		if group is not None:
+			neighbours = set( group )
+		if plus or minus:
+			natural_class = self.fmatrix.find_class( self.inventory, plus or [], minus or [] )
+			if neighbours is None:
+				neighbours = natural_class
+			else:
+				neighbours &= natural_class
+		return context_counts( self.tokens, targets, side, k, skip, neighbours )
+
+	def ngrams( self, order=3, skip=( STRESS, SYLLABLE ) ):
+		"""
+		Count the n-grams of symbols for n = 1 to order, word edges
+		included when known, see ngrams.NgramTable.
+		---------------------
+		skip - symbols left out of the n-grams
+		return - ngrams.NgramTable
+		"""
+		return NgramTable( self.tokens, order, skip )
+
+	def count_patterns( self, patterns ):
+		"""
+		Count the matches of a batch of patterns in one pass over the
+		transcription, see patterns.PatternSet.
+		---------------------
+		patterns - list of patterns, e.g. [ u"[+nasal] . C", u"ˈ C V #" ]
+		return - dict { pattern : frequency }
+		"""
+		return self.compile_patterns( patterns ).count( self.tokens )
+
+	def find_pattern( self, pattern ):
+		"""
+		Where a pattern matches in the transcription.
+		---------------------
+		return - list [ end, ... ], the index of the symbol after each match
+		"""
+		return self.compile_patterns( [ pattern ] ).find( self.tokens )[ pattern ]
+
+	def compile_patterns( self, patterns ):
+		"""
+		Compile patterns once to count them in many passes.
+		---------------------
+		return - patterns.PatternSet
+		"""
+		return PatternSet( patterns, self.tokens.vocabulary, self.fmatrix,
+			self.tokens.lexicon.segmenter )
+
+	def _neighbours( self, target, side, group=None ):
+		target = InputManager( target ).force_unicode()
+		return self.context( [ target ], side, group=group ).get( target, {} )
+
 	def preceding_symbol( self, target  ):
 		"""
 		Count the frequency of symbols preceding the target.
@@ -311,107 +672,28 @@ class Symbols( BasePhonologist ):
 		target - ipa symbol
 		return - dict { symbol : frequency }
 		"""
-		target = InputManager(target).force_unicode()
-		count_dict = {}
-		for ndx,symbol in enumerate( self.tokens[ 1:] ):
-			if symbol == target:
-				if STRESS != self.tokens[ndx]: 
-					count_dict.setdefault( self.tokens[ ndx ],0 )
-					count_dict[self.tokens[ ndx ]] += 1
-				elif ndx > 0:
-					count_dict.setdefault( self.tokens[ ndx - 1 ],0 )
-					count_dict[self.tokens[ ndx - 1 ]] += 1
-		return count_dict
+		return self._neighbours( target, "preceding" )
 
-#####################################################################################
-# THESE METHODS WILL PROBABLY BE REPLACED BY AN OPTIONAL VARIABLE IN preceding_symbol
-# OR A METHOD proceeding_feature_groups
-#####################################################################################
 	def preceding_consonant( self, target ):
-		target = InputManager(target).force_unicode()
-		count_dict = {}
-		for ndx,symbol in enumerate( self.tokens[ 1:] ):
-			if symbol == target:
-				if STRESS != self.tokens[ndx]: 
-					if self.tokens[ ndx ] in CONSONANTS:
-						count_dict.setdefault( self.tokens[ ndx ],0 )
-						count_dict[self.tokens[ ndx ]] += 1
-				elif ndx > 0 and self.tokens[ ndx - 1 ] in CONSONANTS:
-					count_dict.setdefault( self.tokens[ ndx - 1 ],0 )
-					count_dict[self.tokens[ ndx - 1 ]] += 1
-		return count_dict
+		return self._neighbours( target, "preceding", CONSONANTS )
 
 	def preceding_vowell( self, target ):
-		target = InputManager(target).force_unicode()
-		count_dict = {}
-		for ndx,symbol in enumerate( self.tokens[ 1:] ):
-			if symbol == target:
-				if STRESS != self.tokens[ndx]: 
-					if self.tokens[ ndx ] in VOWELLS:
-						count_dict.setdefault( self.tokens[ ndx ],0 )
-						count_dict[self.tokens[ ndx ]] += 1
-				elif ndx > 0 and self.tokens[ ndx - 1 ] in VOWELLS:
-					count_dict.setdefault( self.tokens[ ndx - 1 ],0 )
-					count_dict[self.tokens[ ndx - 1 ]] += 1
-		return count_dict
-##########################################################################
+		return self._neighbours( target, "preceding", VOWELLS )
 
 	def posterior_symbol( self, target ):
 		"""
-		Count the frequency of symbols preceding the target.
+		Count the frequency of symbols posterior to the target.
 		---------------------
 		target - ipa symbol
 		return - dict { symbol : frequency }
 		"""
-		target = InputManager(target).force_unicode()
-		count_dict = {}
-		ndx = 0
-		for i in range( len( self.tokens ) - 1):
-			if self.tokens[ndx] == target:
-				if STRESS != self.tokens[ndx+1]:
-					count_dict.setdefault( self.tokens[ ndx + 1 ],0 )
-					count_dict[self.tokens[ ndx + 1 ]] += 1
-				else:
-					count_dict.setdefault( self.tokens[ ndx + 2 ],0 )
-					count_dict[self.tokens[ ndx + 2 ]] += 1						
-			ndx += 1
-		return count_dict	
-
-#####################################################################################
-# THESE METHODS WILL PROBABLY BE REPLACED BY AN OPTIONAL VARIABLE IN posterior_symbol
-# OR A METHOD posterior_feature_groups
-#####################################################################################
+		return self._neighbours( target, "posterior" )
+
 	def posterior_consonant( self, target ):
-		target = InputManager(target).force_unicode()
-		count_dict = {}
-		ndx = 0
-		for i in range( len( self.tokens ) - 1):
-			if self.tokens[ndx] == target:
-				if STRESS != self.tokens[ndx+1]:
-					if self.tokens[ ndx + 1] in CONSONANTS:
-						count_dict.setdefault( self.tokens[ ndx + 1 ],0 )
-						count_dict[self.tokens[ ndx + 1 ]] += 1
-				elif self.tokens[ndx + 2] in CONSONANTS:
-					count_dict.setdefault( self.tokens[ ndx + 2 ],0 )
-					count_dict[self.tokens[ ndx + 2 ]] += 1						
-			ndx += 1
-		return count_dict	
+		return self._neighbours( target, "posterior", CONSONANTS )
 
 	def posterior_vowell( self, target ):
-		target = InputManager(target).force_unicode()
-		count_dict = {}
-		ndx = 0
-		for i in range( len( self.tokens ) - 1):
-			if self.tokens[ndx] == target:
-				if STRESS != self.tokens[ndx+1]:
-					if self.tokens[ ndx + 1] in VOWELLS:
-						count_dict.setdefault( self.tokens[ ndx + 1 ], 0 )
-						count_dict[self.tokens[ ndx + 1 ]] += 1
-				elif self.tokens[ ndx + 2] in VOWELLS:
-					count_dict.setdefault( self.tokens[ ndx + 2 ], 0 )
-					count_dict[self.tokens[ ndx + 2 ]] += 1
-			ndx += 1
-		return count_dict	
+		return self._neighbours( target, "posterior", VOWELLS )
 
 ##################################################################
 class Features( Symbols ):
@@ -423,18 +705,6 @@ class Features( Symbols ):
 	# possible features for use with features method
 	features_dictionary = DISTINCTIVE_FEATURES
 
-	@classmethod
-	def loadfile( Symbols, ipa_textfile ):
-		"""
-		Same loadfile. Different return - Features class.
-		"""
-		f = codecs.open( ipa_textfile, "r", encoding='utf-8' )
-		text = f.readline()
-		joined_text = re.sub('\s', '', text)
-		syllables = joined_text.split(",")
-		symbols = ''.join(syllables)
-		return Features(symbols)
-		
 	def features( self, plus=None, minus=None ):
 		"""
 		Find all symbols with a series of feature characteristics as 
@@ -444,14 +714,8 @@ class Features( Symbols ):
 		minus - a list of distinctive features with negative value
 		return set ([ sym, ..., sym ])
 		"""
-		if plus:
-			if minus:
-				data = self.find_plus( plus )
-				return self.find_minus( minus, data_arg=data )
-			else:
-				return self.find_plus( plus )
-		else:
-			return self.find_minus( minus )
+		assert plus or minus, "plus or minus must be passed as list [ ] "
+		return self.fmatrix.find_class( self.inventory, plus or [], minus or [] )
 
 	def find_plus( self, plus, data_arg=None ):
 		"""
@@ -462,16 +726,11 @@ class Features( Symbols ):
 		return set ([ sym, ..., sym ])
 		"""
 		assert type( plus ) == list, "plus must be passed as list [ ] "
-		ndx = len( plus ) - 1
 		if data_arg:
-			data = list( data_args )
+			data = data_arg
 		else:
-			data = self.tokens
-		for feature in plus:
-			n_data = find_pos( feature, data ) #from fmatrix_utils
-			data = n_data
-		output = set( data )
-		return output
+			data = self.inventory
+		return self.fmatrix.find_class( data, plus=plus )
 
 	def find_minus( self, minus, data_arg=None ):
 		"""
@@ -482,16 +741,11 @@ class Features( Symbols ):
 		return set ([ sym, ..., sym ])
 		"""
 		assert type( minus ) == list, "minus must be passed as list [ ] "
-		ndx = len( minus ) - 1
 		if data_arg:
-			data = list( data_arg )
+			data = data_arg
 		else:
-			data = self.tokens
-		for feature in minus:
-			n_data = find_neg( feature, data ) #from fmatrix_utils
-			data = n_data
-		output = set( data )
-		return output
+			data = self.inventory
+		return self.fmatrix.find_class( data, minus=minus )
 
 	def feature_group( self, group ): #INVENTORY
 		"""
@@ -501,19 +755,115 @@ class Features( Symbols ):
 		group - a distinctive features group
 		return - dict { symbol : frequency }
 		"""
+		counts = self.id_counts
+		ids = self.tokens.vocabulary.ids
 		symbol_dict = {}
-		for symbol in self.tokens:
-			if symbol in group:
-				symbol_dict.setdefault( symbol, 0 )
-				symbol_dict[ symbol ] += 1
+		for symbol in group:
+			if ids.get( symbol ) in counts:
+				symbol_dict[ symbol ] = counts[ ids[ symbol ] ]
 		return symbol_dict
 
+	def feature_vectors( self ):
+		"""
+		The distinctive features of every symbol in the transcription,
+		1 for +, -1 for - and 0 for 0, with columns in fmatrix.features order.
+		Marks and unknown symbols get a row of 0.
+		---------------------
+		return - numpy int8 array [ position, feature ], or a list
+		of tuples when NumPy is not installed
+		"""
+		count_scan( len( self.tokens ) )
+		lookup = self.fmatrix.indexes( self.tokens.vocabulary.tokens )
+		if numpy is not None:
+			lookup = numpy.array( lookup, dtype=numpy.intp )
+			return self.fmatrix.array[ lookup[ self.tokens.as_numpy() ] ]
+		rows = self.fmatrix.rows
+		return [ rows[ lookup[ token_id ] ] for token_id in self.tokens.ids ]
+
+	def feature_positions( self, plus=None, minus=None ):
+		"""
+		Find the positions of the transcription holding a symbol with
+		a series of feature characteristics as defined by plus and minus.
+		---------------------
+		plus - a list of distinctive features with positive value
+		minus - a list of distinctive features with negative value
+		return - numpy bool array [ position ], or a list of bools
+		when NumPy is not installed
+		"""
+		rows = self.fmatrix.class_rows( plus or [], minus or [] )
+		lookup = self.fmatrix.indexes( self.tokens.vocabulary.tokens )
+		matches = [ rows[ ndx ] for ndx in lookup ]
+		count_scan( len( self.tokens ) )
+		if numpy is not None:
+			return numpy.array( matches, dtype=bool )[ self.tokens.as_numpy() ]
+		return [ matches[ token_id ] for token_id in self.tokens.ids ]
+
+	def feature_cooccurrence( self ):
+		"""
+		Count how often two distinctive features are both positive
+		in the same symbol of the transcription.
+		---------------------
+		return - dict { feature : { feature : frequency } }
+		"""
+		counts = self.tokens.counts()
+		fmatrix = self.fmatrix
+		features = fmatrix.features
+		lookup = fmatrix.indexes( self.tokens.vocabulary.tokens )
+		if numpy is not None:
+			ipa_counts = numpy.zeros( len( fmatrix.array ), dtype=numpy.int64 )
+			numpy.add.at( ipa_counts, lookup, counts )
+			plus = ( fmatrix.array == 1 ).astype( numpy.int64 )
+			matrix = plus.T.dot( plus * ipa_counts[ :, None ] )
+		else:
+			matrix = [ [ 0 ] * len( features ) for feature in features ]
+			for token_id, frequency in enumerate( counts ):
+				if frequency:
+					row = fmatrix.rows[ lookup[ token_id ] ]
+					plus = [ ndx for ndx, val in enumerate( row ) if val == 1 ]
+					for i in plus:
+						for j in plus:
+							matrix[ i ][ j ] += frequency
+		cooccurrence = {}
+		for i, feature in enumerate( features ):
+			for j, other in enumerate( features ):
+				if matrix[ i ][ j ]:
+					cooccurrence.setdefault( feature, {} )[ other ] = int( matrix[ i ][ j ] )
+		return cooccurrence
+
 	def features_in_common( self, *targets ):
 		"""
 		Determine what features two or more have in
 		common.
+		---------------------
+		targets - ipa symbols
+		return - dict { feature : "+" / "-" }
+		"""
+		assert len( targets ) > 1, "features_in_common needs two or more symbols"
+		targets = [ InputManager( target ).force_unicode() for target in targets ]
+		return self.fmatrix.features_in_common( *targets )
+
+	def nearest_symbol( self, target, k=1, weights=None ):
+		"""
+		The symbols of the transcription closest to target in feature
+		distance, see fmatrixutils.FeatureMatrix.distances.
+		---------------------
+		target - ipa symbol
+		k - how many symbols
+		weights - dict { feature : weight }, 1 for features left out
+		return - list [ ( symbol, distance ), ... ], closest first
+		"""
+		target = InputManager( target ).force_unicode()
+		return self.fmatrix.nearest( target, k, self.inventory, weights )
+
+	def similarity( self, target, other, weights=None ):
+		"""
+		Feature similarity of two symbols, 1 for the same features
+		down to 0 for none in common.
+		---------------------
+		return - float
 		"""
-		pass 
+		return self.fmatrix.similarity( InputManager( target ).force_unicode(),
+			InputManager( other ).force_unicode(), weights )
 
 class Vowels( Features ):
 	"""
@@ -522,21 +872,225 @@ class Vowels( Features ):
 	pass
 
 #######################################################
-class TokenIterator( object ):
-	def __init__( self, phon_trans  ):
-		self.current = 0
-		self._token_ref = phon_trans
+class TokenIndex( object ):
+	"""
+	Frequency tables for a sequence of tokens, filled in a single pass.
+	counts - dict { token : frequency }
+	preceding - dict { token : { preceding token : frequency } }
+	posterior - dict { token : { posterior token : frequency } }
+	stressed, unstressed - counts split on primary stress
+	stressed_symbols, unstressed_symbols - dict { symbol : set ([ token, ... ]) },
+	the tokens containing each symbol, split on primary stress
+	"""
+	def __init__( self, tokens ):
+		self.counts = {}
+		self.preceding = {}
+		self.posterior = {}
+		previous = None
+		ndx = -1
+		for ndx, token in enumerate( tokens ):
+			self.counts[ token ] = self.counts.get( token, 0 ) + 1
+			if ndx > 0:
+				neighbours = self.preceding.setdefault( token, {} )
+				neighbours[ previous ] = neighbours.get( previous, 0 ) + 1
+				neighbours = self.posterior.setdefault( previous, {} )
+				neighbours[ token ] = neighbours.get( token, 0 ) + 1
+			previous = token
+		count_scan( ndx + 1 )
+		self.stressed = {}
+		self.unstressed = {}
+		self.stressed_symbols = {}
+		self.unstressed_symbols = {}
+		for token, frequency in self.counts.iteritems():
+			if STRESS in token:
+				self.stressed[ token ] = frequency
+			else:
+				self.unstressed[ token ] = frequency
+			self._add_type( token )
 
-	def __iter__( self ):
+	def _symbols_table( self, token ):
+		if STRESS in token:
+			return self.stressed_symbols
+		else:
+			return self.unstressed_symbols
+
+	def _add_type( self, token ):
+		table = self._symbols_table( token )
+		for symbol in set( token ):
+			table.setdefault( symbol, set() ).add( token )
+
+	def _remove_type( self, token ):
+		table = self._symbols_table( token )
+		for symbol in set( token ):
+			table[ symbol ].discard( token )
+			if not table[ symbol ]:
+				del table[ symbol ]
+
+	def find( self, targets, stressed=None ):
+		"""
+		Find the tokens containing every target, intersecting the
+		token sets of their symbols from the smallest one up.
+		--------------------
+		targets - list of symbols ( longer strings are matched as substrings )
+		stressed - True / False to only look at stressed / unstressed tokens
+		return - set ([ token, ... ])
+		"""
+		if stressed is None:
+			tables = [ self.stressed_symbols, self.unstressed_symbols ]
+		elif stressed:
+			tables = [ self.stressed_symbols ]
+		else:
+			tables = [ self.unstressed_symbols ]
+		symbols = set()
+		for target in targets:
+			symbols.update( target )
+		found = set()
+		for table in tables:
+			if symbols:
+				candidates = sorted( [ table.get( symbol, () ) for symbol in symbols ], key=len )
+				matches = set( candidates[ 0 ] ).intersection( *candidates[ 1: ] )
+			elif table is self.stressed_symbols:
+				matches = set( self.stressed )
+			else:
+				matches = set( self.unstressed )
+			found.update( matches )
+		for target in targets:
+			if len( target ) > 1:
+				found = set([ token for token in found if target in token ])
+		return found
+
+	def merge( self, other ):
+		"""
+		Add the frequencies of another index, as a separate document:
+		no neighbours are counted across the two.
+		"""
+		for token in other.counts:
+			if token not in self.counts:
+				self._add_type( token )
+		add_counts( self.counts, other.counts )
+		add_counts( self.stressed, other.stressed )
+		add_counts( self.unstressed, other.unstressed )
+		for table, other_table in ( ( self.preceding, other.preceding ),
+									( self.posterior, other.posterior ) ):
+			for token, neighbours in other_table.iteritems():
+				add_counts( table.setdefault( token, {} ), neighbours )
 		return self
 
-	def next( self ):
-		if self.current < len( self._token_ref ):
-			token = self._token_ref[ self.current ]
-			self.current += 1
-			return token
+	def add( self, token, delta=1 ):
+		"""
+		Change the frequency of one token by delta.
+		"""
+		if STRESS in token:
+			stress_dict = self.stressed
+		else:
+			stress_dict = self.unstressed
+		if token not in self.counts:
+			self._add_type( token )
+		frequency = self.counts.get( token, 0 ) + delta
+		if frequency:
+			self.counts[ token ] = stress_dict[ token ] = frequency
+		else:
+			del self.counts[ token ]
+			del stress_dict[ token ]
+			self._remove_type( token )
+
+	def add_pair( self, previous, token, delta=1 ):
+		"""
+		Change the frequency of token following previous by delta.
+		"""
+		for table, key, neighbour in ( ( self.preceding, token, previous ),
+										( self.posterior, previous, token ) ):
+			neighbours = table.setdefault( key, {} )
+			frequency = neighbours.get( neighbour, 0 ) + delta
+			if frequency:
+				neighbours[ neighbour ] = frequency
+			else:
+				del neighbours[ neighbour ]
+				if not neighbours:
+					del table[ key ]
+
+	def extend( self, tokens, previous=None ):
+		"""
+		Count tokens added after previous ( None if they come first ).
+		"""
+		for token in tokens:
+			self.add( token )
+			if previous is not None:
+				self.add_pair( previous, token )
+			previous = token
+
+	def replace( self, old, new, previous=None, following=None ):
+		"""
+		Update the tables for one token changed from old to new, between
+		previous and following ( None at the edges ).
+		"""
+		for token, delta in ( ( old, -1 ), ( new, 1 ) ):
+			self.add( token, delta )
+			if previous is not None:
+				self.add_pair( previous, token, delta )
+			if following is not None:
+				self.add_pair( token, following, delta )
+
+def syllable_types( lexicon, targets=None ):
+	"""
+	Whether each syllable type of the lexicon is stressed, and the
+	targets in it. Targets are matched as substrings, as in
+	BaseTokens.token_by_symbol, so a is in ˈkaː as well as aː.
+	--------------------
+	targets - list of ipa symbols, None for every symbol of the
+	lexicon but the stress and phrase marks
+	return - list [ ( stressed, ( symbol, ... ) ), ... ] indexed by syllable id
+	"""
+	if targets is None:
+		# symbols are interned as the syllable types are split
+		lexicon.splits( "syllables" )
+		targets = set( lexicon.symbols.tokens ).difference( [ STRESS, COMMA, PERIOD, SYLLABLE ] )
+	# the targets by their first character, only those starting with a
+	# character of the syllable are looked for in it
+	by_first = {}
+	for target in set( targets ):
+		if target:
+			by_first.setdefault( target[ 0 ], [] ).append( target )
+	syllables = []
+	for syllable in lexicon.syllables.tokens:
+		found = set()
+		for character in set( syllable ).intersection( by_first ):
+			found.update( [ target for target in by_first[ character ] if target in syllable ] )
+		syllables.append( ( STRESS in syllable, tuple( found ) ) )
+	return syllables
+
+def count_tonic( count_dict, syllable_ids, syllables, frequency=1 ):
+	"""
+	Add the pretonic, postonic and tonic counts of one word.
+	--------------------
+	syllable_ids - the syllables of the word
+	syllables - as returned by syllable_types
+	"""
+	last = len( syllable_ids ) - 1
+	for ndx, syllable_id in enumerate( syllable_ids ):
+		stressed, symbols = syllables[ syllable_id ]
+		if not symbols:
+			continue
+		positions = []
+		if stressed:
+			positions.append( "tonic" )
 		else:
-			raise StopIteration
+			if ndx > 0 and syllables[ syllable_ids[ ndx - 1 ] ][ 0 ]:
+				positions.append( "pretonic" )
+			if ndx < last and syllables[ syllable_ids[ ndx + 1 ] ][ 0 ]:
+				positions.append( "postonic" )
+		for symbol in symbols:
+			symbol_dict = count_dict.setdefault( symbol,
+				{ "pretonic":0, "postonic":0, "tonic":0 } )
+			for position in positions:
+				symbol_dict[ position ] += frequency
+
+def add_counts( count_dict, other ):
+	"""
+	Add the frequencies of other to count_dict in place.
+	"""
+	for key, frequency in other.iteritems():
+		count_dict[ key ] = count_dict.get( key, 0 ) + frequency
 
 class InputManager( object ):
 	"""
@@ -554,45 +1108,63 @@ class InputManager( object ):
 		else:
 			return self.input
 
+	def _level( self ):
+		if isinstance( self.input, BasePhonologist ):
+			return self.input.tokens.level
+
 	def words( self ):
-		if type(self.input) == list:
-			return self.input
+		if self._level() == "words":
+			return self.input.tokens.copy()
+		elif type(self.input) == list:
+			words = self.input
 		elif type(self.input) == unicode:
-			return self.input.split()
+			words = self.input.split()
 		elif type(self.input) == str:
 			uinput = self.input.decode('utf-8')
-			return uinput.split()
+			words = uinput.split()
+		elif hasattr( self.input, "__iter__" ):
+			words = self.input
 		else:
 			raise TypeError
+		return TokenArray.encode( words, "words" )
 
 	def syllables( self ):
-		if type(self.input) == Words or type(self.input) == Phrases: 
-			return self.input.syllabify()
+		if self._level() == "words":
+			return self.input.tokens.split().copy()
+		elif self._level() == "syllables":
+			return self.input.tokens.copy()
 		elif type(self.input) == list:
-			return self.input
+			syllables = self.input
 		elif type(self.input) == unicode:
-			return self.input.split(".")
+			syllables = self.input.split(".")
 		elif type(self.input) == str:
 			uinput = self.input.decode('utf-8')
-			return uinput.split(".")
+			syllables = uinput.split(".")
+		elif hasattr( self.input, "__iter__" ):
+			syllables = self.input
 		else:
 			raise TypeError
+		return TokenArray.encode( syllables, "syllables" )
 
 	def symbols( self ):
-		if type(self.input) == Words or type(self.input) == Phrases:
-			return ''.join( self.input.syllabify() )
-		elif type(self.input) == Syllables:
-			return ''.join( self.input.tokens )
+		if self._level() == "words":
+			return self.input.tokens.split().split().copy()
+		elif self._level() == "syllables":
+			return self.input.tokens.split().copy()
+		elif self._level() == "symbols":
+			return self.input.tokens.copy()
 		elif type(self.input) == unicode:
-			output = re.sub( '\s','', self.input )
-			return output
-		if type(self.input) == str:
+			symbols = SEGMENTER.segments( re.sub( '\s','', self.input ) )
+		elif type(self.input) == str:
 			output = re.sub('\s','', self.input)
-			return output.decode('utf-8')
-		elif type(self.input) == list:
-			return ''.join(self.input)
+			symbols = SEGMENTER.segments( output.decode('utf-8') )
+		elif hasattr( self.input, "__iter__" ):
+			# lists and streams of strings, split into segments, not
+			# cached as the strings need not be word or syllable types
+			symbols = chain.from_iterable( imap( SEGMENTER.segments, self.input ) )
 		else:
 			raise TypeError
+		return TokenArray.encode( symbols, "symbols" )
 
 
 	
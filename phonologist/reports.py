@@ -0,0 +1,151 @@
+# -*- encoding: utf-8 -*-
+import csv
+import codecs
+import os
+from constants import VOWELLS, CONSONANTS
+from context import neighbour_counts, SIDES
+from fmatrixutils import force_unicode
+from phonologist import Words, syllable_types
+
+# A column is ( header, kind, group ). kind is one of
+#   "words" / "syllables" - tokens containing the target
+#   "stressed" / "unstressed" - syllables containing the target, split on stress
+#   "preceding" / "posterior" - neighbouring symbols in group, skipping stress
+#   "pretonic" / "postonic" - as in Words.pretonic_postonic_words
+BASIC_COLUMNS = [ ( "Words", "words", None ), ( "Syllables", "syllables", None ),
+				( "+Stress", "stressed", None ), ( "-Stress", "unstressed", None ) ]
+ENVIRONMENT_COLUMNS = [ ( "_V", "posterior", VOWELLS ), ( "C_", "preceding", CONSONANTS ),
+				( "_C", "posterior", CONSONANTS ), ( "S_", "preceding", [ u"s" ] ),
+				( "_S", "posterior", [ u"s" ] ), ( "Pre", "pretonic", None ),
+				( "Post", "postonic", None ) ]
+SECTIONS = [ ( "Basic Count", BASIC_COLUMNS ), ( "Environment Count", ENVIRONMENT_COLUMNS ) ]
+
+
+class EnvironmentReport( object ):
+	"""
+	Target x environment tables, filled with one visit per word type
+	for the word level columns and one pass over the symbols for the
+	neighbour columns of both sides.
+	"""
+	def __init__( self, targets, sections=SECTIONS ):
+		self.targets = [ force_unicode( target ) for target in targets ]
+		self.sections = sections
+
+	def table( self, words ):
+		"""
+		Fill every column of every section for all targets.
+		----------------------
+		words - Words object
+		return - dict { target : { kind : frequency } } with one key for
+		each word level kind and { ( kind, header ) : frequency } for
+		neighbour kinds
+		"""
+		table = dict( [ ( target, {} ) for target in self.targets ] )
+		self._count_types( words, table )
+		self._count_neighbours( words, table )
+		return table
+
+	def _count_types( self, words, table ):
+		"""
+		The word level columns, visiting each word type once with its
+		frequency in Words.id_counts. Targets are matched as substrings,
+		see phonologist.syllable_types.
+		"""
+		lexicon = words.tokens.lexicon
+		splits = lexicon.splits( "words" )
+		word_tokens = lexicon.words.tokens
+		syllables = syllable_types( lexicon, self.targets )
+		for word_id, frequency in words.id_counts.iteritems():
+			word = word_tokens[ word_id ]
+			for target in self.targets:
+				if target in word:
+					row = table[ target ]
+					row[ "words" ] = row.get( "words", 0 ) + frequency
+			syllable_ids = splits[ word_id ]
+			last = len( syllable_ids ) - 1
+			for ndx, syllable_id in enumerate( syllable_ids ):
+				stressed, found = syllables[ syllable_id ]
+				if not found:
+					continue
+				kinds = [ "syllables", "stressed" if stressed else "unstressed" ]
+				if not stressed:
+					if ndx > 0 and syllables[ syllable_ids[ ndx - 1 ] ][ 0 ]:
+						kinds.append( "pretonic" )
+					if ndx < last and syllables[ syllable_ids[ ndx + 1 ] ][ 0 ]:
+						kinds.append( "postonic" )
+				for target in found:
+					row = table[ target ]
+					for kind in kinds:
+						row[ kind ] = row.get( kind, 0 ) + frequency
+
+	def _count_neighbours( self, words, table ):
+		"""
+		Neighbours as in Symbols.preceding_symbol / posterior_symbol,
+		both sides in one pass over the symbols.
+		"""
+		groups = []
+		for title, columns in self.sections:
+			for header, kind, group in columns:
+				if kind in SIDES:
+					groups.append( ( header, kind, frozenset( group ) ) )
+		if not groups:
+			return
+		contexts = neighbour_counts( words.tokens.split().split(), self.targets )
+		for target in self.targets:
+			row = table[ target ]
+			for header, kind, group in groups:
+				counts = contexts[ kind ].get( target, {} )
+				row[ ( kind, header ) ] = sum( [ frequency for neighbour, frequency
+					in counts.iteritems() if neighbour in group ] )
+
+	def rows( self, table, columns ):
+		"""
+		The rows of one section, one per target.
+		"""
+		for target in self.targets:
+			row = [ target ]
+			for header, kind, group in columns:
+				if kind in SIDES:
+					row.append( table[ target ].get( ( kind, header ), 0 ) )
+				else:
+					row.append( table[ target ].get( kind, 0 ) )
+			yield row
+
+	def write( self, writer, name, words ):
+		"""
+		Write the report of one speaker.
+		----------------------
+		writer - csv writer
+		name - speaker name
+		words - Words object
+		"""
+		table = self.table( words )
+		writerow( writer, [ name ] )
+		for ndx, ( title, columns ) in enumerate( self.sections ):
+			if ndx > 0:
+				writerow( writer, [ " " ] )
+				writerow( writer, [ " " ] )
+			writerow( writer, [ title ] )
+			writerow( writer, [ " " ] + [ header for header, kind, group in columns ] )
+			for row in self.rows( table, columns ):
+				writerow( writer, row )
+
+	def run( self, ipa_textfiles, csv_path ):
+		"""
+		Write the report of every speaker file to csv_path, one
+		speaker at a time so only one corpus is loaded at once.
+		"""
+		csvfile = codecs.open( csv_path, 'wb' )
+		try:
+			csvfile.write( u'\ufeff'.encode( 'utf8' ) )
+			writer = csv.writer( csvfile )
+			for ipa_textfile in ipa_textfiles:
+				name = os.path.splitext( os.path.basename( ipa_textfile ) )[ 0 ]
+				self.write( writer, name, Words.loadfile( ipa_textfile ) )
+		finally:
+			csvfile.close()
+
+
+def writerow( writer, row ):
+	writer.writerow( [ cell.encode( 'utf-8' ) if isinstance( cell, unicode ) else cell
+		for cell in row ] )
\ No newline at end of file
@@ -0,0 +1,89 @@
+# -*- encoding: utf-8 -*-
+"""
+Longest match segmentation of transcriptions into IPA segments. A
+segment is a base symbol with the diacritics, length marks and other
+modifiers that follow it, and tie bars join two base symbols into one.
+"""
+import re
+from unicodedata import normalize
+
+# spacing modifiers that belong to the symbol before them: length,
+# half length, aspiration, labialization, palatalization, velarization,
+# pharyngealization, nasal and lateral release, ejective
+MODIFIERS = u"ːˑʰʷʲˠˤⁿˡʼ"
+# combining diacritics, tie bars apart
+COMBINING = u"\u0300-\u035b\u035d-\u0360\u0362-\u036f\u1dc0-\u1dff\u20d0-\u20ff"
+# tie bars above and below
+TIES = u"\u035c\u0361"
+# tied affricates with a single symbol in IPA_SYMBOLS
+LIGATURES = { u"ts": u"ʦ", u"dz": u"ʣ", u"tʃ": u"ʧ", u"dʒ": u"ʤ" }
+_STRIP = re.compile( u"[%s%s%s]" % ( TIES, COMBINING, MODIFIERS ), re.UNICODE )
+
+# word and syllable types kept by Segmenter.split
+CACHE_SIZE = 2 ** 16
+
+
+class Segmenter( object ):
+	"""
+	Splits transcriptions into segments with one compiled regular
+	expression. The segments of a token are cached, so every word or
+	syllable type is only segmented once.
+	inventory - multi character segments matched before anything else,
+	longest first, e.g. digraphs of a custom feature matrix
+	cache_size - tokens cached at most, the cache starts over when full
+	"""
+	def __init__( self, inventory=(), cache_size=CACHE_SIZE ):
+		self.inventory = sorted( set( [ segment for segment in inventory if len( segment ) > 1 ] ),
+			key=len, reverse=True )
+		modified = u"[^%s%s%s][%s%s]*" % ( TIES, COMBINING, MODIFIERS, COMBINING, MODIFIERS )
+		pattern = u"%s(?:[%s]%s)*" % ( modified, TIES, modified )
+		if self.inventory:
+			pattern = u"%s|%s" % ( u"|".join( [ re.escape( segment ) for segment in self.inventory ] ),
+				pattern )
+		# stray modifiers with no symbol before them are segments of their own
+		pattern = u"%s|." % pattern
+		self.regex = re.compile( pattern, re.UNICODE | re.DOTALL )
+		self.cache_size = cache_size
+		self._cache = {}
+
+	def segments( self, text ):
+		"""
+		Segment text in one pass.
+		--------------------
+		return - list [ segment, ..., segment ]
+		"""
+		return self.regex.findall( text )
+
+	def split( self, token ):
+		"""
+		Cached segments of a word or syllable type.
+		--------------------
+		return - tuple ( segment, ..., segment )
+		"""
+		try:
+			return self._cache[ token ]
+		except KeyError:
+			if len( self._cache ) >= self.cache_size:
+				self._cache.clear()
+			segments = self._cache[ token ] = tuple( self.regex.findall( token ) )
+			return segments
+
+
+def base_symbol( segment, inventory=None ):
+	"""
+	The segment without its modifiers and tie bars, with tied
+	affricates written as their ligature: t͡ʃ gives ʧ, aː gives a.
+	Precomposed letters lose their marks too, ã gives a.
+	inventory - symbols the NFC and NFD forms of the segment are looked
+	up in before anything is stripped, so c and a cedilla give ç
+	"""
+	if inventory is not None:
+		for form in ( segment, normalize( "NFC", segment ), normalize( "NFD", segment ) ):
+			if form in inventory:
+				return form
+	if len( segment ) == 1 and segment < u"\u00c0":
+		return segment
+	base = _STRIP.sub( u"", normalize( "NFD", segment ) )
+	return LIGATURES.get( base, base )
+
+SEGMENTER = Segmenter()
@@ -0,0 +1,260 @@
+# -*- encoding: utf-8 -*-
+"""
+Local query server keeping corpora loaded and indexed between scripts.
+Queries are json over http on localhost, one thread per request.
+usage: python server.py [ port [ cache_dir ] ]
+
+	>>> client = Client()
+	>>> words = client.Words( "speaker.txt" )
+	>>> words.count_token( u"ˈka.sa" )
+"""
+import json
+import os
+import sys
+import threading
+import urllib2
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from phonologist import Words, Syllables, Symbols, Features, Vowels
+
+HOST = "127.0.0.1"
+PORT = 8470
+CLASSES = dict( [ ( cls.__name__, cls ) for cls in ( Words, Syllables, Symbols, Features, Vowels ) ] )
+# read only methods a client may call
+QUERIES = frozenset( [ "count_token", "preceding_token", "posterior_token",
+	"stressed_frequency", "unstressed_frequency", "token_by_symbol",
+	"stressed_token_by_symbol", "unstressed_token_by_symbol", "token_by_symbols",
+	"syllabify", "pretonic_postonic_words", "pretonic_postonic_symbols",
+	"pretonic_postonic_syllables", "word_types", "constituent_frequency",
+	"stress_positions", "context", "preceding_symbol", "preceding_consonant",
+	"preceding_vowell", "posterior_symbol", "posterior_consonant",
+	"posterior_vowell", "features", "find_plus", "find_minus", "feature_group",
+	"feature_vectors", "feature_positions", "feature_cooccurrence", "inventory",
+	"features_in_common", "nearest_symbol", "similarity", "minimal_pairs",
+	"neighbours", "count_patterns", "find_pattern", "phonotactic_scores" ] )
+
+
+class QueryError( Exception ):
+	"""
+	A query the server could not answer.
+	"""
+
+
+class CorpusPool( object ):
+	"""
+	Corpora loaded once and shared by every request. Each corpus is
+	loaded under its own lock, so a long load only holds back the
+	requests for that corpus. Loading builds every lazily built table
+	the queries use, after that the queries only read the corpora.
+	"""
+	def __init__( self, cache=None ):
+		self.cache = cache
+		self.corpora = {}
+		# guards the dicts only, a corpus is loaded under its own lock
+		self._lock = threading.Lock()
+		self._loading = {}
+
+	def get( self, kind, ipa_textfile ):
+		if kind not in CLASSES:
+			raise QueryError( "unknown class %s" % kind )
+		key = ( kind, os.path.abspath( ipa_textfile ) )
+		with self._lock:
+			if key in self.corpora:
+				return self.corpora[ key ]
+			loading = self._loading.setdefault( key, threading.Lock() )
+		with loading:
+			with self._lock:
+				if key in self.corpora:
+					return self.corpora[ key ]
+			try:
+				corpus = self._load( CLASSES[ kind ], key[ 1 ] )
+				with self._lock:
+					self.corpora[ key ] = corpus
+			finally:
+				with self._lock:
+					self._loading.pop( key, None )
+		return corpus
+
+	def _load( self, cls, ipa_textfile ):
+		if not os.path.isfile( ipa_textfile ):
+			raise QueryError( "no such file %s" % ipa_textfile )
+		corpus = cls.loadfile( ipa_textfile, cache=self.cache )
+		# build the lazy tables now, so requests never race to build them:
+		# the split layers and the lexicon splits, which intern symbols
+		corpus.id_counts
+		if hasattr( corpus, "index" ):
+			corpus.index
+		if hasattr( corpus, "neighbourhood" ):
+			corpus.neighbourhood()
+		tokens = corpus.tokens
+		while tokens.level != "symbols":
+			tokens = tokens.split()
+		lexicon = corpus.tokens.lexicon
+		lexicon.splits( "words" )
+		lexicon.splits( "syllables" )
+		lexicon.word_types()
+		return corpus
+
+	def query( self, kind, ipa_textfile, method, args=(), kwargs=None ):
+		"""
+		Call one read only method of a loaded corpus.
+		"""
+		if method not in QUERIES:
+			raise QueryError( "%s is not a query" % method )
+		corpus = self.get( kind, ipa_textfile )
+		if not hasattr( corpus, method ):
+			raise QueryError( "%s has no %s" % ( kind, method ) )
+		value = getattr( corpus, method )
+		if callable( value ):
+			value = value( *args, **dict( [ ( str( name ), arg )
+				for name, arg in ( kwargs or {} ).iteritems() ] ) )
+		return value
+
+	def loaded( self ):
+		with self._lock:
+			return sorted( self.corpora )
+
+
+class QueryHandler( BaseHTTPRequestHandler ):
+	"""
+	POST /query { "class", "path", "method", "args", "kwargs" }
+	GET /corpora
+	Answers { "result": ... } or { "error": ... }
+	"""
+	def do_GET( self ):
+		if self.path != "/corpora":
+			return self._reply( 404, { "error": "not found" } )
+		self._reply( 200, { "result": [ [ kind, path ] for kind, path in self.server.pool.loaded() ] } )
+
+	def do_POST( self ):
+		if self.path != "/query":
+			return self._reply( 404, { "error": "not found" } )
+		try:
+			request = json.loads( self.rfile.read( int( self.headers.get( "Content-Length", 0 ) ) ) )
+			result = self.server.pool.query( request[ "class" ], request[ "path" ],
+				request[ "method" ], request.get( "args", [] ), request.get( "kwargs" ) )
+			data = encode( result )
+		except ( QueryError, ValueError, KeyError, TypeError, AssertionError ), e:
+			return self._reply( 400, { "error": "%s: %s" % ( type( e ).__name__, e ) } )
+		except Exception, e:
+			return self._reply( 500, { "error": "%s: %s" % ( type( e ).__name__, e ) } )
+		self._reply( 200, { "result": data } )
+
+	def _reply( self, status, body ):
+		data = json.dumps( body )
+		self.send_response( status )
+		self.send_header( "Content-Type", "application/json" )
+		self.send_header( "Content-Length", str( len( data ) ) )
+		self.end_headers()
+		self.wfile.write( data )
+
+	def log_message( self, format, *args ):
+		pass
+
+
+class CorpusServer( ThreadingMixIn, HTTPServer ):
+	daemon_threads = True
+
+	def __init__( self, address=( HOST, PORT ), cache=None ):
+		HTTPServer.__init__( self, address, QueryHandler )
+		self.pool = CorpusPool( cache )
+
+
+def encode( value ):
+	"""
+	Make query results json safe. Sets, tuples and dicts whose keys
+	are not strings are tagged so decode can rebuild them.
+	"""
+	if isinstance( value, dict ):
+		if all( [ isinstance( key, basestring ) for key in value ] ):
+			return dict( [ ( key, encode( item ) ) for key, item in value.iteritems() ] )
+		return { "__items__": [ [ encode( key ), encode( item ) ] for key, item in value.iteritems() ] }
+	if isinstance( value, ( set, frozenset ) ):
+		return { "__set__": [ encode( item ) for item in value ] }
+	if isinstance( value, tuple ):
+		return { "__tuple__": [ encode( item ) for item in value ] }
+	if isinstance( value, list ):
+		return [ encode( item ) for item in value ]
+	if hasattr( value, "tolist" ):
+		return value.tolist()
+	if hasattr( value, "__slots__" ):
+		return dict( [ ( name, encode( getattr( value, name ) ) ) for name in value.__slots__ ] )
+	return value
+
+def decode( value ):
+	"""
+	json object hook undoing encode.
+	"""
+	if "__items__" in value:
+		return dict( [ ( hashable( key ), item ) for key, item in value[ "__items__" ] ] )
+	if "__set__" in value:
+		return set( [ hashable( item ) for item in value[ "__set__" ] ] )
+	if "__tuple__" in value:
+		return tuple( value[ "__tuple__" ] )
+	return value
+
+def hashable( value ):
+	if isinstance( value, list ):
+		return tuple( value )
+	return value
+
+
+class Client( object ):
+	"""
+	Thin client. client.Words( path ) and the other class names give
+	a RemoteCorpus answering the query methods of that class.
+	"""
+	def __init__( self, address=( HOST, PORT ), timeout=None ):
+		self.url = "http://%s:%d" % address
+		self.timeout = timeout
+
+	def __getattr__( self, kind ):
+		if kind not in CLASSES:
+			raise AttributeError( kind )
+		return lambda ipa_textfile: RemoteCorpus( self, kind, os.path.abspath( ipa_textfile ) )
+
+	def query( self, kind, ipa_textfile, method, args=(), kwargs=None ):
+		data = json.dumps( { "class": kind, "path": ipa_textfile, "method": method,
+			"args": list( args ), "kwargs": kwargs or {} } )
+		return self._request( urllib2.Request( self.url + "/query", data,
+			{ "Content-Type": "application/json" } ) )
+
+	def corpora( self ):
+		return [ tuple( corpus ) for corpus in self._request( urllib2.Request( self.url + "/corpora" ) ) ]
+
+	def _request( self, request ):
+		try:
+			response = urllib2.urlopen( request, timeout=self.timeout )
+		except urllib2.HTTPError, e:
+			response = e
+		try:
+			body = json.loads( response.read(), object_hook=decode )
+		finally:
+			response.close()
+		if "error" in body:
+			raise QueryError( body[ "error" ] )
+		return body[ "result" ]
+
+
+class RemoteCorpus( object ):
+	"""
+	A corpus loaded in the server, with the query methods of its class.
+	"""
+	def __init__( self, client, kind, ipa_textfile ):
+		self.client = client
+		self.kind = kind
+		self.path = ipa_textfile
+
+	def __getattr__( self, method ):
+		if method not in QUERIES or not hasattr( CLASSES[ self.kind ], method ):
+			raise AttributeError( method )
+		if method == "inventory":
+			return self.client.query( self.kind, self.path, method )
+		return lambda *args, **kwargs: self.client.query( self.kind, self.path,
+			method, args, kwargs )
+
+
+if __name__ == '__main__':
+	port = int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else PORT
+	cache = sys.argv[ 2 ] if len( sys.argv ) > 2 else None
+	CorpusServer( ( HOST, port ), cache ).serve_forever()
@@ -1,7 +1,25 @@
 # -*- coding: utf-8 -*-
+import csv
+import io
+import os
+import shutil
+import tempfile
+import threading
 import unittest
+import warnings
 
-from phonologist import Words
+from fileutils import iter_words, Normalizer
+from constants import NASALS, STRESS
+from fmatrixutils import (compile_fmatrix, read_csv, load_fmatrix,
+                          write_fmatrix, build_fmatrix, FEATURES)
+from phonologist import Words, Syllables, Symbols, Features, TokenIndex
+from parallel import corpus_statistics
+from benchmark import generate, run_benchmarks, compare, public_methods
+from reports import EnvironmentReport
+from context import context_counts, neighbour_counts
+from server import Client, CorpusServer, QueryError
+from instrument import instrumentation, profiled
+from segments import Segmenter
 
 
 class Phonologist(object):
@@ -23,16 +41,589 @@ class Phonologist(object):
 class PhonologistTestCase(unittest.TestCase):
 
     def setUp(self):
-        pass
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        with io.open(self.path, "w", encoding="utf-8-sig") as f:
+            f.write(u"ˈka.sa ˈpe.ro\r\nla ˈka.sa\n| ˈlu.na \u2016\n")
 
     def tearDown(self):
-        pass
+        os.remove(self.path)
 
     def test_get_words(self):
         w = u"yo escribo un test"
         words = Words(w)
         self.assertEquals(words.tokens, [u'yo', u'escribo', u'un', u'test'])
 
+    def test_token_index(self):
+        words = Words(u"ˈka.sa ˈpe.ro ˈka.sa ˈka.sa la")
+        self.assertEquals(words.count_token(u"ˈka.sa"), {u"ˈka.sa": 3})
+        self.assertEquals(words.count_token(u"no"), {u"no": 0})
+        self.assertEquals(words.preceding_token(u"ˈka.sa"),
+                          {u"ˈpe.ro": 1, u"ˈka.sa": 1})
+        self.assertEquals(words.posterior_token(u"ˈka.sa"),
+                          {u"ˈpe.ro": 1, u"ˈka.sa": 1, u"la": 1})
+        self.assertEquals(words.unstressed_frequency(), {u"la": 1})
+        words[4] = u"ˈlo"
+        self.assertEquals(words.stressed_frequency(),
+                          {u"ˈka.sa": 3, u"ˈpe.ro": 1, u"ˈlo": 1})
+
+    def test_loadfile(self):
+        words = [u"ˈka.sa", u"ˈpe.ro", u"la", u"ˈka.sa", u"|", u"ˈlu.na",
+                 u"\u2016"]
+        self.assertEquals(list(iter_words(self.path, chunk_size=3)), words)
+        self.assertEquals(Words.loadfile(self.path).tokens, words)
+        self.assertEquals(Syllables.loadfile(self.path).tokens[:4],
+                          [u"ˈka", u"sa", u"ˈpe", u"ro"])
+        symbols = u"ˈkasaˈperolaˈkasa|ˈluna\u2016"
+        self.assertEquals(Symbols.loadfile(self.path).tokens, symbols)
+        self.assertEquals(Features.loadfile(self.path).tokens, symbols)
+
+    def test_token_by_symbols(self):
+        words = Words(u"ˈka.ɲa ˈka.ɲa ˈɲo.ɲa ka.ˈsa la.ɲa")
+        self.assertEquals(words.token_by_symbols([u"ɲ", u"a"], stressed=True),
+                          {u"ˈka.ɲa": 2, u"ˈɲo.ɲa": 1})
+        self.assertEquals(words.unstressed_token_by_symbol(u"ɲ"), {u"la.ɲa": 1})
+        words[4] = u"ˈlo"
+        self.assertEquals(words.token_by_symbol(u"l"), {u"ˈlo": 1})
+        self.assertEquals(words.token_by_symbol(u"a.ˈ"), {u"ka.ˈsa": 1})
+
+    def test_append(self):
+        words = Words(u"ˈka.sa la")
+        words.count_token(u"la")
+        words.extend(u"ˈka.sa ˈpe.ro")
+        words.append(u"la")
+        words[3] = u"ˈka.sa"
+        self.assertEquals(words.index.__dict__, TokenIndex(words.tokens).__dict__)
+        self.assertEquals(words.preceding_token(u"ˈka.sa"),
+                          {u"la": 1, u"ˈka.sa": 1})
+        syllables = Syllables(Words(u"ˈka.sa la ˈpa.ta sa"))
+        syllables.append(u"ro")
+        self.assertEquals(list(syllables.tokens.word_offsets),
+                          [0, 2, 3, 5, 6, 7])
+        self.assertEquals(syllables.count_patterns([u"a #"]), {u"a #": 4})
+        symbols = Symbols(Words(u"ˈka.sa la"))
+        symbols.extend(Words(u"ˈpa.ta o"))
+        self.assertEquals(list(symbols.tokens.word_offsets), [0, 5, 7, 12, 13])
+        self.assertEquals(symbols.ngrams(2).count((u"a", u"#")), 3)
+        words = Words(u"ˈka.sa la")
+        layer = words.tokens.split().split()
+        symbols = Symbols(words)
+        symbols.append(u"o")
+        offsets = symbols.tokens.word_offsets
+        self.assertFalse(offsets is layer.word_offsets)
+        symbols.append(u"e")
+        symbols.extend(Words(u"ˈpa.ta"))
+        self.assertTrue(symbols.tokens.word_offsets is offsets)
+        self.assertEquals(list(offsets), [0, 5, 7, 8, 9, 14])
+        self.assertEquals(list(layer.word_offsets), [0, 5, 7])
+        symbols = Features(u"ˈkasa")
+        symbols.features(plus=["cons"])
+        symbols.extend(u"ɲo")
+        symbols[0] = u"a"
+        self.assertEquals(symbols.features(plus=["cons"]),
+                          set([u"k", u"s", u"ɲ"]))
+
+    def test_loadfile_cache(self):
+        cache = tempfile.mkdtemp()
+        try:
+            first = Words.loadfile(self.path, cache=cache)
+            self.assertEquals(len(os.listdir(cache)), 1)
+            second = Words.loadfile(self.path, cache=cache)
+            self.assertEquals(second.tokens, first.tokens)
+            self.assertEquals(second.index.__dict__, first.index.__dict__)
+            symbols = Symbols.loadfile(self.path, cache=cache)
+            cached = Symbols.loadfile(self.path, cache=cache)
+            self.assertEquals(cached.tokens, symbols.tokens)
+            self.assertEquals(cached.tokens.word_offsets,
+                              symbols.tokens.word_offsets)
+            self.assertEquals(cached.count_patterns([u"a #", u"a . s"]),
+                              symbols.count_patterns([u"a #", u"a . s"]))
+            syllables = Syllables.loadfile(self.path, cache=cache)
+            cached = Syllables.loadfile(self.path, cache=cache)
+            self.assertEquals(cached.tokens.word_offsets,
+                              syllables.tokens.word_offsets)
+            self.assertEquals(cached.pretonic_postonic_syllables([u"a"]),
+                              syllables.pretonic_postonic_syllables([u"a"]))
+            with io.open(self.path, "a", encoding="utf-8") as f:
+                f.write(u"la\n")
+            self.assertEquals(Words.loadfile(self.path, cache=cache).tokens[-1],
+                              u"la")
+            self.assertEquals(len(os.listdir(cache)), 4)
+        finally:
+            shutil.rmtree(cache)
+
+    def test_normalize(self):
+        with io.open(self.path, "w", encoding="utf-8") as f:
+            f.write(u"ˈga.to\u200b ˈc\u0327a Qo\n")
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            words = Words.loadfile(self.path)
+        self.assertEquals(list(words), [u"ˈɡa.to", u"ˈça", u"Qo"])
+        self.assertEquals(len(caught), 1)
+        self.assertTrue("Q (1)" in str(caught[0].message))
+        self.assertEquals(list(Words.loadfile(self.path, profile=None))[0],
+                          u"ˈga.to\u200b")
+        lengths = Normalizer("NFD", {u":": u"ː"})
+        self.assertEquals(lengths.normalize(u"ça:"), u"c\u0327aː")
+        cache = tempfile.mkdtemp()
+        try:
+            with warnings.catch_warnings(record=True):
+                warnings.simplefilter("always")
+                self.assertEquals(list(iter_words(self.path, chunk_size=4,
+                                                  profile="ipa")),
+                                  [u"ˈga.to", u"ˈça", u"Qo"])
+                Words.loadfile(self.path, cache=cache, profile=None)
+                Words.loadfile(self.path, cache=cache)
+            self.assertEquals(len(os.listdir(cache)), 2)
+        finally:
+            shutil.rmtree(cache)
+
+    def test_nasal_vowels(self):
+        with io.open(self.path, "w", encoding="utf-8") as f:
+            f.write(u"ˈka\u0303.so\u0303 ˈc\u0327a\n")
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            features = Features.loadfile(self.path)
+            words = Words.loadfile(self.path)
+        self.assertEquals(features.features(plus=["syll"]),
+                          set([u"\u00e3", u"\u00f5", u"a"]))
+        self.assertEquals(features.nearest_symbol(u"\u00e3")[0][0], u"a")
+        self.assertEquals(features.fmatrix.row(u"c\u0327"),
+                          features.fmatrix.row(u"\u00e7"))
+        self.assertEquals(words.constituent_frequency("nucleus"),
+                          {u"\u00e3": 1, u"\u00f5": 1, u"a": 1})
+
+    def test_token_array(self):
+        words = Words(u"ˈka.sa ˈpe.ro ˈka.sa")
+        self.assertEquals(list(words.tokens.ids), [0, 1, 0])
+        syllables = Syllables(words)
+        self.assertTrue(syllables.tokens.lexicon is words.tokens.lexicon)
+        self.assertEquals(list(syllables.tokens.word_offsets), [0, 2, 4, 6])
+        symbols = Symbols(syllables)
+        self.assertEquals(symbols.tokens, u"ˈkasaˈperoˈkasa")
+        self.assertEquals(symbols[1], u"k")
+        self.assertEquals(list(symbols.tokens.word_offsets), [0, 5, 10, 15])
+        self.assertEquals(list(symbols.tokens.syllable_offsets)[:3], [0, 3, 5])
+
+    def test_syllabify(self):
+        words = Words(u"ˈka.sa ˈpe.ro ˈka.sa")
+        syllables = words.iter_syllables()
+        self.assertEquals(next(syllables), u"ˈka")
+        self.assertEquals(list(syllables), [u"sa", u"ˈpe", u"ro", u"ˈka", u"sa"])
+        self.assertEquals(words.syllabify()[:2], [u"ˈka", u"sa"])
+        first, second = Symbols(words), Symbols(words)
+        self.assertTrue(first.tokens.syllable_offsets is
+                        second.tokens.syllable_offsets)
+        self.assertTrue(Syllables(words).tokens.word_offsets is
+                        Syllables(words).tokens.word_offsets)
+        first[1] = u"g"
+        self.assertEquals(second.tokens, u"ˈkasaˈperoˈkasa")
+
+    def test_environment_report(self):
+        fd, report = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            EnvironmentReport(["a", "o"]).run([self.path], report)
+            with open(report, "rb") as f:
+                rows = list(csv.reader(f))
+        finally:
+            os.remove(report)
+        self.assertEquals(rows[1:4], [["Basic Count"],
+                                      [" ", "Words", "Syllables", "+Stress",
+                                       "-Stress"],
+                                      ["a", "4", "6", "2", "4"]])
+        self.assertEquals(rows[9], ["a", "0", "6", "4", "2", "2", "3", "0"])
+        self.assertEquals(rows[10], ["o", "0", "1", "1", "0", "0", "1", "0"])
+        words = Words.loadfile(self.path)
+        symbols = words.tokens.split().split()
+        words.id_counts
+        with instrumentation() as stats:
+            table = EnvironmentReport(["a", "o"]).table(words)
+        self.assertEquals([(record["scans"], record["scanned"])
+                           for record in stats.methods.values()
+                           if record["scans"]], [(1, len(symbols))])
+        self.assertEquals(table[u"a"][("preceding", "C_")], 6)
+        contexts = neighbour_counts(symbols)
+        for side in ("preceding", "posterior"):
+            self.assertEquals(contexts[side], context_counts(symbols, side=side))
+
+    def test_corpus_statistics(self):
+        fd, other = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with io.open(other, "w", encoding="utf-8") as f:
+                f.write(u"la ˈka.sa ˈpa.ta\n")
+            paths = [self.path, other, self.path]
+            pooled = corpus_statistics(paths, processes=2)
+            single = corpus_statistics(paths, processes=1)
+        finally:
+            os.remove(other)
+        self.assertEquals(pooled.index.__dict__, single.index.__dict__)
+        self.assertEquals(pooled.count_token(u"ˈka.sa"), {u"ˈka.sa": 5})
+        self.assertEquals(pooled.preceding_token(u"ˈka.sa"),
+                          {u"la": 3})
+        self.assertEquals(pooled.posterior_token(u"la"), {u"ˈka.sa": 3})
+        self.assertEquals(pooled.pretonic_postonic(u"a"),
+                          {"pretonic": 8, "postonic": 0})
+
+    def test_server(self):
+        server = CorpusServer(("127.0.0.1", 0))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            client = Client(server.server_address)
+            words = client.Words(self.path)
+            self.assertEquals(words.count_token(u"ˈka.sa"), {u"ˈka.sa": 2})
+            self.assertEquals(words.token_by_symbols([u"k"]),
+                              Words.loadfile(self.path).token_by_symbols([u"k"]))
+            self.assertEquals(words.stress_positions(), {2: 4, None: 3})
+            loaded = server.pool.get("Words", self.path)
+            self.assertTrue(loaded._neighbourhood is not None)
+            index = loaded._neighbourhood
+            words.neighbours(u"ˈka.ta")
+            self.assertTrue(loaded._neighbourhood is index)
+            features = client.Features(self.path)
+            self.assertEquals(features.features(plus=["nasal"]), set([u"n"]))
+            self.assertEquals(features.context(k=2),
+                              Features.loadfile(self.path).context(k=2))
+            self.assertEquals(client.corpora(),
+                              [("Features", os.path.abspath(self.path)),
+                               ("Words", os.path.abspath(self.path))])
+            self.assertRaises(QueryError, client.query, "Words", self.path,
+                              "extend", [[u"la"]])
+            self.assertRaises(AttributeError, getattr, words, "append")
+            query = server.pool.query
+            server.pool.query = lambda *args: 1 / 0
+            self.assertRaises(QueryError, words.count_token, u"la")
+            server.pool.query = query
+            self.assertEquals(words.count_token(u"la"), {u"la": 1})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_benchmark(self):
+        lines = list(generate(500, seed=3))
+        self.assertEquals(lines, list(generate(500, seed=3)))
+        self.assertNotEquals(lines, list(generate(500, seed=4)))
+        tokens = u" ".join(lines).split()
+        self.assertEquals(len(tokens), 500)
+        self.assertTrue(u"|" in tokens and u"\u2016" in tokens)
+        self.assertTrue(any(STRESS in token and u"." in token
+                            for token in tokens))
+        results = run_benchmarks([200], repeat=1, classes=(Symbols,))
+        self.assertEquals(sorted(results["200"]),
+                          ["Symbols.%s" % method
+                           for method in public_methods(Symbols)])
+        self.assertEquals(compare(results, results), [])
+        baseline = {"200": {"Symbols.context": {"best": 0.0, "memory": 0}}}
+        results["200"]["Symbols.context"]["best"] = 1.0
+        self.assertEquals(compare(results, baseline)[0][:3],
+                          ("200", "Symbols.context", "best"))
+
+    def test_instrumentation(self):
+        count_token = Words.count_token
+        with instrumentation() as stats:
+            words = Words.loadfile(self.path)
+            words.count_token(u"la")
+            words.count_token(u"la")
+            Symbols(words).preceding_consonant(u"a")
+        self.assertEquals(Words.count_token, count_token)
+        self.assertEquals(stats.methods["Words.count_token"]["calls"], 2)
+        self.assertEquals(stats.methods["Words.count_token"]["scanned"], 7)
+        self.assertEquals(stats.methods["Symbols.context"]["scanned"], 24)
+        self.assertEquals(stats.methods["Symbols.preceding_consonant"]["calls"], 1)
+        self.assertEquals(stats.caches["index"], {"hits": 1, "misses": 1})
+        words.count_token(u"la")
+        self.assertEquals(stats.methods["Words.count_token"]["calls"], 2)
+        directory = tempfile.mkdtemp()
+        try:
+            stats.dump_json(os.path.join(directory, "stats.json"))
+            stats.dump_csv(os.path.join(directory, "stats.csv"))
+            with open(os.path.join(directory, "stats.csv"), "rb") as f:
+                self.assertTrue(["Words.count_token", "2"] in
+                                [row[:2] for row in csv.reader(f)])
+            with profiled(os.path.join(directory, "profile")):
+                words.syllabify()
+            self.assertTrue(os.path.getsize(os.path.join(directory, "profile")))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_pretonic_postonic(self):
+        words = Words(u"ˈka.sa ka.ˈsa.na ˈmi")
+        profile = words.pretonic_postonic_symbols()
+        self.assertEquals(profile[u"a"],
+                          {"pretonic": 2, "postonic": 1, "tonic": 2})
+        self.assertEquals(profile[u"i"],
+                          {"pretonic": 0, "postonic": 0, "tonic": 1})
+        self.assertEquals(words.pretonic_postonic_words(u"k"),
+                          {"pretonic": 0, "postonic": 1})
+        self.assertEquals(Syllables(words).pretonic_postonic_syllables(),
+                          profile)
+        # targets are substrings, a is in the long vowel too
+        words = Words(u"ka.ˈsaː ˈkaː.ma")
+        self.assertEquals(words.pretonic_postonic_symbols()[u"a"],
+                          {"pretonic": 1, "postonic": 1, "tonic": 2})
+        self.assertEquals(words.pretonic_postonic_words(u"a"),
+                          {"pretonic": 1, "postonic": 1})
+        self.assertEquals(words.pretonic_postonic_words(u"aː"),
+                          {"pretonic": 0, "postonic": 0})
+        self.assertEquals(len(words.token_by_symbol(u"a")), 2)
+        row = EnvironmentReport([u"a"]).table(words)[u"a"]
+        self.assertEquals((row["words"], row["pretonic"], row["postonic"]),
+                          (2, 1, 1))
+
+    def test_word_types(self):
+        words = Words(u"ˈkas.ta ka.ˈsa ˈkas.ta ˈmi pst")
+        word_types = dict([(u"".join(words.tokens.lexicon.symbols[ndx]
+                                     for ndx in word_type.symbols), word_type)
+                           for word_type, frequency in words.word_types()])
+        kasta = word_types[u"ˈkasta"]
+        self.assertEquals(kasta.syllable_spans, ((0, 4), (4, 6)))
+        self.assertEquals(kasta.stressed, 0)
+        self.assertEquals(kasta.onsets, ((1, 2), (4, 5)))
+        self.assertEquals(kasta.nuclei, ((2, 3), (5, 6)))
+        self.assertEquals(kasta.codas, ((3, 4), (6, 6)))
+        self.assertEquals(word_types[u"pst"].nuclei, ((3, 3),))
+        self.assertTrue(words.tokens.lexicon.word_types()[0] is kasta)
+        self.assertEquals(words.constituent_frequency("coda"), {u"s": 2})
+        self.assertEquals(words.constituent_frequency("onset", stressed=False),
+                          {u"t": 3, u"k": 1, u"p": 1, u"s": 1})
+        self.assertEquals(words.constituent_frequency("nucleus", stressed=True),
+                          {u"a": 3, u"i": 1})
+        self.assertEquals(words.stress_positions(), {1: 2, 2: 2, None: 1})
+
+    def test_segments(self):
+        symbols = Symbols(u"ˈt͡ʃaː kʰa")
+        self.assertEquals(list(symbols), [STRESS, u"t͡ʃ", u"aː", u"kʰ", u"a"])
+        self.assertEquals(list(Symbols(Words(u"ˈt͡ʃaː kʰa"))), list(symbols))
+        features = Features(u"ˈt͡ʃaː kʰa")
+        self.assertEquals(features.features(plus=["syll"]),
+                          set([u"aː", u"a"]))
+        self.assertEquals(features.features(plus=["d_rel"], minus=["voi"]),
+                          set([u"t͡ʃ"]))
+        word_type = Words(u"ˈkʰaːn").word_types()[0][0]
+        self.assertEquals((word_type.onsets, word_type.nuclei),
+                          (((1, 2),), ((2, 3),)))
+        with io.open(self.path, "w", encoding="utf-8") as f:
+            f.write(u"ˈt͡ʃaː.kʰa\n")
+        self.assertEquals(list(Symbols.loadfile(self.path)),
+                          [STRESS, u"t͡ʃ", u"aː", u"kʰ", u"a"])
+        segmenter = Segmenter(cache_size=2)
+        for token in (u"ka", u"sa", u"ma"):
+            self.assertEquals(len(segmenter.split(token)), 2)
+        self.assertEquals(segmenter._cache, {u"ma": (u"m", u"a")})
+
+    def test_context(self):
+        symbols = Symbols(u"ˈkasa ˈmaɲa")
+        self.assertEquals(symbols.posterior_symbol(u"a"),
+                          {u"s": 1, u"m": 1, u"ɲ": 1})
+        self.assertEquals(symbols.posterior_consonant(u"ɲ"), {})
+        self.assertEquals(symbols.preceding_symbol(u"m"), {u"a": 1})
+        context = symbols.context(side="preceding", k=2, plus=["son"])
+        self.assertEquals(context[u"ɲ"], {(u"m", u"a"): 1})
+        self.assertEquals(context[u"a"], {(u"a", u"m"): 1, (u"a", u"ɲ"): 1})
+        context = symbols.context([u"a", u"k"], side="posterior",
+                                  skip=[STRESS, u"s"])
+        self.assertEquals(context, {u"a": {u"a": 1, u"m": 1, u"ɲ": 1},
+                                    u"k": {u"a": 1}})
+
+    def test_features(self):
+        features = Features(u"ˈka.sa ˈma.ɲo")
+        self.assertEquals(features.features(plus=["nasal"]),
+                          set([u"m", u"ɲ"]))
+        self.assertEquals(features.features(plus=["syll"], minus=["back"]),
+                          set([u"a"]))
+        self.assertEquals(features.find_minus(["son", "voi"]),
+                          set([u"k", u"s"]))
+
+    def test_feature_arrays(self):
+        features = Features(u"ˈma ɲa")
+        self.assertEquals(features.feature_group(NASALS),
+                          {u"m": 1, u"ɲ": 1})
+        self.assertEquals([bool(match) for match in
+                           features.feature_positions(plus=["nasal"],
+                                                      minus=["lab"])],
+                          [False, False, False, True, False])
+        nasal = FEATURES.index("nasal")
+        self.assertEquals([int(row[nasal]) for row in
+                           features.feature_vectors()], [0, 1, -1, 1, -1])
+        cooccurrence = features.feature_cooccurrence()
+        self.assertEquals(cooccurrence["nasal"]["son"], 2)
+        self.assertEquals(cooccurrence["syll"]["syll"], 2)
+        self.assertFalse("nasal" in cooccurrence["syll"])
+
+    def test_compile_fmatrix(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            bits, plus, minus, zero = compile_fmatrix(
+                {"cons": ["+ ", "-"], "voi": ["0", "+"]}, [u"t", u"a"])
+        self.assertEquals(len(caught), 1)
+        self.assertEquals(plus, [bits["cons"], bits["voi"]])
+        self.assertEquals(minus, [0, bits["cons"]])
+        self.assertEquals(zero, [bits["voi"], 0])
+        self.assertRaises(ValueError, compile_fmatrix,
+                          {"cons": ["?", "-"]}, [u"t", u"a"])
+
+    def test_feature_distance(self):
+        features = Features(u"ˈma.pa ˈbo.ɸa")
+        self.assertEquals(features.features_in_common(u"m", u"p", u"b"),
+                          {"cons": "+", "lab": "+", "syll": "-", "lat": "-",
+                           "cor": "-", "dor": "-", "phar": "-", "d_rel": "-",
+                           "strid": "-", "CG": "-", "SG": "-", "rnd": "-",
+                           "cont": "-"})
+        self.assertEquals(features.nearest_symbol(u"p", k=2),
+                          [(u"b", 1.0), (u"ɸ", 1.0)])
+        self.assertEquals(features.nearest_symbol(u"p", weights={"voi": 3}),
+                          [(u"ɸ", 1.0)])
+        self.assertEquals(features.similarity(u"p", u"p"), 1.0)
+        self.assertTrue(features.similarity(u"p", u"b") >
+                        features.similarity(u"p", u"a"))
+        fmatrix = features.fmatrix
+        weights = dict.fromkeys(fmatrix.features, 0)
+        self.assertEquals(fmatrix.similarity(u"p", u"a", weights), 1.0)
+        self.assertRaises(AssertionError, fmatrix.similarity, u"p", u"b",
+                          {"voice": 3})
+        self.assertRaises(AssertionError, fmatrix.distances, {"voice": 3})
+        self.assertEquals(fmatrix.shared()[fmatrix.row(u"m")][fmatrix.row(u"b")],
+                          len(fmatrix.features_in_common(u"m", u"b")))
+
+    def test_unknown_symbols(self):
+        # Q is not in the matrix, it has no features and is in no class
+        features = Features(u"ˈmaQ.pa")
+        fmatrix = features.fmatrix
+        self.assertEquals(fmatrix.row(u"Q"), fmatrix.no_features)
+        self.assertEquals(fmatrix.value(u"Q", "cons"), "0")
+        self.assertEquals(fmatrix.features_in_common(u"Q", u"p"), {})
+        self.assertEquals(features.features(plus=["cons"]),
+                          set([u"m", u"p"]))
+        self.assertEquals(features.features(minus=["syll"]),
+                          set([u"m", u"p"]))
+        self.assertEquals(features.context(plus=["cons"])[u"a"],
+                          {u"m": 1, u"p": 1})
+        self.assertEquals(features.feature_positions(plus=["cons"])[3], False)
+        self.assertEquals(features.nearest_symbol(u"m"), [(u"p", 3.0)])
+        self.assertEquals(len(features.nearest_symbol(u"Q", k=3)), 3)
+        self.assertTrue(0 < features.similarity(u"Q", u"p") < 1)
+        self.assertEquals(features.count_patterns([u"[+cons]"]),
+                          {u"[+cons]": 2})
+        words = Words(u"ˈka.Qa ˈka.sa ˈka.ta")
+        self.assertEquals(words.minimal_pairs(plus=["cons"]),
+                          [(u"ˈka.sa", u"ˈka.ta", u"s", u"t")])
+
+    def test_minimal_pairs(self):
+        words = Words(u"ˈka.sa ˈka.ta ka.ˈsa ˈma.sa ˈka.sa ˈki.sa | ˈpa")
+        self.assertEquals(words.minimal_pairs(position="stressed"),
+                          [(u"ˈka.sa", u"ˈki.sa", u"a", u"i"),
+                           (u"ˈka.sa", u"ˈma.sa", u"k", u"m")])
+        self.assertEquals(words.minimal_pairs(position="unstressed"),
+                          [(u"ˈka.sa", u"ˈka.ta", u"s", u"t")])
+        self.assertEquals(len(words.minimal_pairs()), 6)
+        self.assertEquals(words.minimal_pairs(plus=["cons"], minus=["son"]),
+                          [(u"ka.ˈsa", u"ˈka.ta", u"s", u"t"),
+                           (u"ˈka.sa", u"ˈka.ta", u"s", u"t")])
+        self.assertEquals(words.neighbours(u"ˈta.sa"),
+                          {u"ˈka.sa": (u"t", u"k"), u"ka.ˈsa": (u"t", u"k"),
+                           u"ˈma.sa": (u"t", u"m")})
+        self.assertEquals(Words(u"ˈka.sa ˈka.ta").minimal_pairs(plus=["cons"]),
+                          [(u"ˈka.sa", u"ˈka.ta", u"s", u"t")])
+        index = words.neighbourhood()
+        self.assertTrue(words.neighbourhood() is index)
+        words.append(u"ˈta.sa")
+        self.assertFalse(words.neighbourhood() is index)
+        self.assertEquals(words.neighbours(u"ˈka.sa")[u"ˈta.sa"],
+                          (u"k", u"t"))
+        index = words.neighbourhood()
+        words[0] = u"ˈla.sa"
+        self.assertFalse(words.neighbourhood() is index)
+
+    def test_patterns(self):
+        words = Words(u"ˈkan.ta ma.ˈsa ˈnu | ˈpin")
+        patterns = [u"[+nasal] . C", u"n t", u"# ˈ C", u"V #", u"NASALS",
+                    u"_ _", u"[+nasal -son]"]
+        counts = {u"[+nasal] . C": 1, u"n t": 1, u"# ˈ C": 3, u"V #": 3,
+                  u"NASALS": 4, u"_ _": 10, u"[+nasal -son]": 0}
+        self.assertEquals(Symbols(words).count_patterns(patterns), counts)
+        self.assertEquals(Syllables(words).count_patterns(patterns), counts)
+        self.assertEquals(Symbols(words).find_pattern(u"V #"), [6, 11, 14])
+        # without offsets only the syllable marks are boundries
+        self.assertEquals(Symbols(u"ˈkan.ta ma").count_patterns(
+            [u"n t", u"# C", u"V #", u"a m"]),
+            {u"n t": 1, u"# C": 1, u"V #": 1, u"a m": 1})
+        self.assertRaises(AssertionError, Symbols(words).count_patterns,
+                          [u"[+nasl]"])
+        self.assertEquals(Symbols(words).count_patterns(
+            [u"CV", u"ˈCV#", u"NASALS_LIQUIDS.C", u"C_"]),
+            {u"CV": 6, u"ˈCV#": 2, u"NASALS_LIQUIDS.C": 1, u"C_": 7})
+        self.assertRaises(ValueError, Symbols(words).count_patterns, [u"CX"])
+        self.assertRaises(ValueError, Symbols(words).count_patterns,
+                          [u"NASAL"])
+
+    def test_ngrams(self):
+        words = Words(u"ˈka.sa ˈka.ta ˈsa ˈka.sa")
+        table = Symbols(words).ngrams(3)
+        self.assertEquals(table.ngrams(2),
+                          {(u"#", u"k"): 3, (u"#", u"s"): 1, (u"k", u"a"): 3,
+                           (u"a", u"s"): 2, (u"a", u"t"): 1, (u"s", u"a"): 3,
+                           (u"t", u"a"): 1, (u"a", u"#"): 4})
+        self.assertEquals(table.count((u"a", u"#", u"k")), 0)
+        self.assertEquals(table.probability((u"#", u"k")), 0.75)
+        self.assertEquals(table.probability((u"k", u"a", u"s")), 2.0 / 3)
+        likely, unlikely, unseen = table.scores([u"ˈka.sa", u"ˈta.ka", u"ˈxo"])
+        self.assertTrue(likely > unlikely)
+        self.assertEquals(table.scores([u"ˈxo"], smoothing=0), [float("-inf")])
+        syllables = Syllables(words).ngrams(2)
+        self.assertEquals(syllables.count((u"ˈka", u"sa")), 2)
+        self.assertEquals(syllables.probability((u"ˈka", u"ta")), 1.0 / 3)
+        scores = words.phonotactic_scores([u"ˈka.sa", u"ˈta.ta"])
+        self.assertEquals((scores[u"ˈka.sa"]["neighbours"],
+                           scores[u"ˈka.sa"]["frequency"]), (1, 1))
+        self.assertEquals(scores[u"ˈta.ta"]["neighbours"], 1)
+        self.assertAlmostEquals(scores[u"ˈka.sa"]["probability"],
+                                Symbols(words).ngrams(2).scores([u"ˈka.sa"])[0])
+
+    def test_natural_class(self):
+        fmatrix = read_csv()
+        nasals = fmatrix.natural_class(["nasal", "cons"])
+        self.assertTrue(nasals is fmatrix.natural_class(["cons", "nasal"]))
+        self.assertEquals(nasals, frozenset(NASALS))
+        with instrumentation() as stats:
+            features = Features(u"ˈma.ɲa")
+            features.fmatrix = fmatrix
+            features.features(plus=["cons", "nasal"])
+            features.features(plus=["nasal"], minus=["syll"])
+        self.assertEquals(stats.caches["natural_class"],
+                          {"hits": 1, "misses": 1})
+
+    def test_fmatrix_file(self):
+        self.assertEquals(build_fmatrix(), read_csv().as_dict())
+        directory = tempfile.mkdtemp()
+        try:
+            csv_path = os.path.join(directory, "custom.csv")
+            path = os.path.join(directory, "custom.bin")
+            with open(csv_path, "wb") as f:
+                f.write(u"symbols,p,m,a,ã\nnasal,-,+,-,+\nsyll,-,-,+,+\n"
+                        .encode("utf-8"))
+            write_fmatrix(csv_path, path)
+            fmatrix = load_fmatrix(path)
+            self.assertEquals(fmatrix.symbols, [u"p", u"m", u"a", u"ã"])
+            self.assertEquals(fmatrix.value(u"ã", "nasal"), "+")
+            features = Features(u"pa mã")
+            features.fmatrix = fmatrix
+            self.assertEquals(features.features(plus=["nasal", "syll"]),
+                              set([u"ã"]))
+            self.assertEquals(Features(u"pa").features(plus=["nasal"]), set())
+            with open(path, "rb") as f:
+                data = f.read()
+            with open(path, "wb") as f:
+                f.write(data[:-1])
+            self.assertRaises(ValueError, load_fmatrix, path)
+            with open(path, "wb") as f:
+                f.write(data.replace('"format": 1', '"format": 9'))
+            self.assertRaises(ValueError, load_fmatrix, path)
+        finally:
+            shutil.rmtree(directory)
+
     def test_one(self):
         ph = Phonologist()
         ph.words = ["one", "word"]